@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import User, Category, Tag, Post, Comment, UserAction
+from .models import User, Category, Tag, Post, Comment, UserAction, DailyStats, ImageJob, StoredImage
 
 
 @admin.register(User)
@@ -32,7 +32,7 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('category', 'tags', 'is_published', 'is_featured', 'created_at')
     search_fields = ('title', 'content')
     filter_horizontal = ('tags',)
-    readonly_fields = ('views', 'likes', 'favorites', 'created_at', 'updated_at')
+    readonly_fields = ('views', 'likes', 'favorites', 'comment_count', 'created_at', 'updated_at')
     
     fieldsets = (
         ('基本信息', {
@@ -42,7 +42,7 @@ class PostAdmin(admin.ModelAdmin):
             'fields': ('is_published', 'is_featured')
         }),
         ('统计信息', {
-            'fields': ('views', 'likes', 'favorites', 'created_at', 'updated_at'),
+            'fields': ('views', 'likes', 'favorites', 'comment_count', 'created_at', 'updated_at'),
             'classes': ('collapse',)
         }),
     )
@@ -70,4 +70,27 @@ class UserActionAdmin(admin.ModelAdmin):
     list_display = ('user', 'post', 'action', 'created_at')
     list_filter = ('action', 'created_at')
     search_fields = ('user__username', 'post__title')
-    readonly_fields = ('created_at',)
\ No newline at end of file
+    readonly_fields = ('created_at',)
+
+
+@admin.register(DailyStats)
+class DailyStatsAdmin(admin.ModelAdmin):
+    list_display = ('date', 'posts_published', 'comments', 'new_users', 'likes', 'favorites', 'views')
+    date_hierarchy = 'date'
+    readonly_fields = ('updated_at',)
+
+
+@admin.register(ImageJob)
+class ImageJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'status', 'user', 'post', 'attempts', 'run_after', 'created_at')
+    list_filter = ('kind', 'status')
+    search_fields = ('user__username', 'post__title', 'last_error')
+    readonly_fields = ('created_at', 'updated_at', 'locked_at', 'result_url', 'last_error')
+
+
+@admin.register(StoredImage)
+class StoredImageAdmin(admin.ModelAdmin):
+    list_display = ('kind', 'content_hash', 'url', 'created_at')
+    list_filter = ('kind',)
+    search_fields = ('content_hash', 'url')
+    readonly_fields = ('created_at',)
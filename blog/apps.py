@@ -4,4 +4,7 @@ from django.apps import AppConfig
 class BlogConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'blog'
-    verbose_name = '博客系统'
\ No newline at end of file
+    verbose_name = '博客系统'
+    
+    def ready(self):
+        from . import signals  # noqa: F401
\ No newline at end of file
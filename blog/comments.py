@@ -0,0 +1,39 @@
+"""
+文章评论树
+
+一次查询取出文章下所有已审核的评论（连同用户），在内存中组装父子关系，
+模板直接使用预先算好的回复列表和数量，不再逐条评论查询。
+"""
+from .models import Comment
+
+
+def load_comment_tree(post):
+    """
+    返回 (顶层评论列表, 评论总数)
+
+    每条评论附带 reply_list（按时间倒序的直接回复）和 reply_count。
+    """
+    comments = list(
+        Comment.objects.filter(post=post, is_approved=True)
+        .select_related('user')
+        .order_by('-created_at', '-pk')
+    )
+
+    by_id = {}
+    for comment in comments:
+        comment.reply_list = []
+        by_id[comment.pk] = comment
+
+    roots = []
+    for comment in comments:
+        parent = by_id.get(comment.parent_id) if comment.parent_id else None
+        if parent is not None:
+            parent.reply_list.append(comment)
+        elif comment.parent_id is None:
+            roots.append(comment)
+        # 父评论未通过审核时，其回复不显示
+
+    for comment in comments:
+        comment.reply_count = len(comment.reply_list)
+
+    return roots, len(comments)
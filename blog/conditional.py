@@ -0,0 +1,121 @@
+"""
+条件请求（ETag / Last-Modified）
+
+文章页和列表页根据少量时间戳计算校验值，客户端带 If-None-Match / If-Modified-Since
+且内容未变化时直接返回 304，不执行视图、不渲染模板。
+
+- 文章页：文章的 updated_at、评论数和最新评论时间
+- 列表页：已发布文章中最新的 updated_at
+- 两者都叠加 page_cache.pages_changed_at()（侧边栏、横幅、分类等变化）和当前用户的
+  导航栏相关信息，登录、退出、换头像后不会拿到别人的或过期的页面
+- 上面的数据库查询结果按页面缓存版本号缓存：文章、评论变化时 signals 递增版本号，
+  旧的查询结果随之失效，命中页面缓存的匿名请求不再查询数据库
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max, Q
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from .models import Post
+from .page_cache import page_version, pages_changed_at
+
+
+def _timestamp(value):
+    return int(value.timestamp()) if value else 0
+
+
+def _user_fingerprint(user):
+    if not user.is_authenticated:
+        return 'anonymous'
+    return f'{user.pk}:{user.avatar or ""}:{user.is_admin or user.is_superuser}:{user.is_vip_active()}'
+
+
+def _cached(name, compute):
+    """按页面缓存版本号缓存校验值用到的查询结果"""
+    key = f'blog:conditional:{page_version()}:{name}'
+    cached = cache.get(key)
+    if cached is None:
+        # 包一层元组，查询结果为 None（文章不存在）时也能缓存
+        cached = (compute(),)
+        cache.set(key, cached, getattr(settings, 'PAGE_CACHE_TIMEOUT', 300))
+    return cached[0]
+
+
+def _validators(request, parts, last_modified):
+    """返回 (ETag, Last-Modified 时间戳)"""
+    changed_at = pages_changed_at()
+    parts = [request.get_full_path(), _user_fingerprint(request.user), str(changed_at), *map(str, parts)]
+    etag = hashlib.md5('|'.join(parts).encode()).hexdigest()
+    return etag, max(last_modified, changed_at)
+
+
+def post_validators(request, pk):
+    """文章页的校验值；文章不存在或是VIP文章时返回 None，交给视图处理"""
+    row = _cached(f'post:{pk}', lambda: (
+        Post.objects.filter(pk=pk)
+        .annotate(
+            approved_comments=Count('comments', filter=Q(comments__is_approved=True)),
+            last_comment_at=Max('comments__created_at'),
+        )
+        .values_list('updated_at', 'approved_comments', 'last_comment_at', 'is_vip_only')
+        .first()
+    ))
+    if row is None or row[3]:
+        return None
+    updated_at, approved_comments, last_comment_at, _ = row
+    last_modified = max(_timestamp(updated_at), _timestamp(last_comment_at))
+    return _validators(request, [_timestamp(updated_at), approved_comments, _timestamp(last_comment_at)], last_modified)
+
+
+def listing_validators(request, *args, **kwargs):
+    """列表页的校验值"""
+    newest = _cached('listing', lambda: (
+        Post.objects.filter(is_published=True).aggregate(newest=Max('updated_at'))['newest']
+    ))
+    return _validators(request, [_timestamp(newest)], _timestamp(newest))
+
+
+def conditional_page(validators, on_not_modified=None):
+    """
+    视图装饰器：支持条件请求
+
+    validators(request, *args, **kwargs) 返回 (etag, last_modified 时间戳) 或 None；
+    on_not_modified 在返回 304 时调用，用于记录浏览数这类仍需执行的副作用。
+    与 django.views.decorators.http.condition 相比，两个值共用一次查询，并支持 304 时的回调。
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+
+            result = validators(request, *args, **kwargs)
+            if result is None:
+                return view(request, *args, **kwargs)
+
+            etag, last_modified = result
+            etag = quote_etag(etag)
+            last_modified_header = http_date(last_modified)
+
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is not None:
+                if response.status_code == 304 and on_not_modified:
+                    on_not_modified(request, *args, **kwargs)
+            else:
+                response = view(request, *args, **kwargs)
+
+            if response.status_code in (200, 304):
+                response.headers.setdefault('ETag', etag)
+                response.headers.setdefault('Last-Modified', last_modified_header)
+                # 允许浏览器保存，但每次使用前都要重新验证；登录用户的页面不允许共享缓存保存
+                if request.user.is_authenticated:
+                    patch_cache_control(response, no_cache=True, private=True)
+                else:
+                    patch_cache_control(response, no_cache=True)
+            return response
+        return wrapper
+    return decorator
@@ -1,13 +1,33 @@
+from django.conf import settings
+from django.core.cache import cache
 from django.db.models import Count, Q
+from django.utils.functional import SimpleLazyObject
 from .models import Category
+from . import timing
+
+
+SITE_CATEGORIES_CACHE_KEY = 'blog:site_categories'
+
+
+def get_site_categories():
+    """获取导航栏分类，优先读缓存"""
+    with timing.span('context'):
+        categories = cache.get(SITE_CATEGORIES_CACHE_KEY)
+        if categories is None:
+            categories = list(Category.objects.annotate(
+                post_count=Count('post', filter=Q(post__is_published=True))
+            ).filter(post_count__gt=0).order_by('name')[:8])  # 最多显示8个分类
+            cache.set(SITE_CATEGORIES_CACHE_KEY, categories, getattr(settings, 'SIDEBAR_CACHE_TIMEOUT', 600))
+    return categories
+
+
+def invalidate_site_categories():
+    """使导航栏分类缓存失效"""
+    cache.delete(SITE_CATEGORIES_CACHE_KEY)
 
 
 def site_categories(request):
-    """为所有模板提供网站分类数据"""
-    categories = Category.objects.annotate(
-        post_count=Count('post', filter=Q(post__is_published=True))
-    ).filter(post_count__gt=0).order_by('name')[:8]  # 最多显示8个分类
-    
+    """为所有模板提供网站分类数据（模板实际用到时才查询）"""
     return {
-        'site_categories': categories,
-    }
\ No newline at end of file
+        'site_categories': SimpleLazyObject(get_site_categories),
+    }
@@ -0,0 +1,106 @@
+"""
+文章热度
+
+热度 = 浏览、点赞、收藏、评论按 Post.HOT_WEIGHTS 加权累加，并随时间指数衰减（半衰期 HOT_SCORE_HALF_LIFE 小时）。
+
+- 计数变化时在同一条 UPDATE 中按权重增减 hot_score（见 Post.counter_update），不单独计算
+- decay_hot_scores 命令定时把所有热度乘以衰减系数，旧文章的热度逐渐下降
+- (is_published, hot_score) 上有组合索引，推荐阅读和热门列表按索引倒序读取前几条
+- decay_hot_scores --rebuild 按点赞、收藏、评论的时间重新计算热度，用于首次升级或修正偏差
+"""
+import math
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Post, Comment, UserAction
+
+
+# 低于该值的热度直接归零，衰减时不再反复更新这些行
+HOT_SCORE_FLOOR = 0.01
+
+
+def _half_life_hours():
+    return getattr(settings, 'HOT_SCORE_HALF_LIFE', 72)
+
+
+def decay_factor(hours):
+    """经过 hours 小时后热度剩余的比例"""
+    return 0.5 ** (hours / _half_life_hours())
+
+
+def hot_posts():
+    """按热度倒序的已发布文章（包含VIP文章，用于显示标识），取前几条时走 (is_published, hot_score) 索引"""
+    return Post.objects.filter(is_published=True).order_by('-hot_score', '-pk')
+
+
+def decay_scores(hours):
+    """
+    所有文章的热度按经过的时间衰减，返回更新的文章数
+    """
+    factor = decay_factor(hours)
+    Post.objects.filter(hot_score__gt=0, hot_score__lt=HOT_SCORE_FLOOR / factor).update(hot_score=0)
+    return Post.objects.filter(hot_score__gt=0).update(hot_score=F('hot_score') * factor)
+
+
+def _average_decay(age_hours):
+    """浏览没有时间记录，按在文章发布以来均匀发生估算：衰减系数在 [0, age] 上的平均值"""
+    if age_hours <= 0:
+        return 1.0
+    rate = math.log(2) / _half_life_hours()
+    return (1 - math.exp(-rate * age_hours)) / (rate * age_hours)
+
+
+def rebuild_scores(batch_size=1000, stdout=None):
+    """
+    从点赞、收藏、评论记录和浏览数重新计算全部文章的热度，返回处理的文章数
+    """
+    now = timezone.now()
+    weights = Post.HOT_WEIGHTS
+    action_fields = UserAction.COUNTER_FIELDS
+
+    def age_hours(moment):
+        return max((now - moment).total_seconds() / 3600, 0)
+
+    processed = 0
+    last_pk = 0
+    while True:
+        posts = list(
+            Post.objects.filter(pk__gt=last_pk)
+            .order_by('pk')
+            .only('pk', 'views', 'created_at', 'hot_score')[:batch_size]
+        )
+        if not posts:
+            break
+        first_pk, last_pk = posts[0].pk, posts[-1].pk
+
+        scores = defaultdict(float)
+        actions = (
+            UserAction.objects.filter(post_id__gte=first_pk, post_id__lte=last_pk)
+            .values_list('post_id', 'action', 'created_at')
+            .order_by()
+        )
+        for post_id, action, created_at in actions:
+            scores[post_id] += weights[action_fields[action]] * decay_factor(age_hours(created_at))
+
+        comments = (
+            Comment.objects.filter(post_id__gte=first_pk, post_id__lte=last_pk, is_approved=True)
+            .values_list('post_id', 'created_at')
+            .order_by()
+        )
+        for post_id, created_at in comments:
+            scores[post_id] += weights['comment_count'] * decay_factor(age_hours(created_at))
+
+        for post in posts:
+            views = weights['views'] * post.views * _average_decay(age_hours(post.created_at))
+            score = scores[post.pk] + views
+            post.hot_score = score if score >= HOT_SCORE_FLOOR else 0
+
+        Post.objects.bulk_update(posts, ['hot_score'])
+        processed += len(posts)
+        if stdout:
+            stdout.write(f'已处理 {processed} 篇')
+
+    return processed
@@ -0,0 +1,227 @@
+"""
+图片处理任务队列
+
+上传视图只把原始文件保存下来并登记一条 ImageJob，立即返回；
+缩放、转码和上传到七牛云由 run_image_worker 命令在请求之外完成。
+
+- 领取任务时用 SELECT ... FOR UPDATE SKIP LOCKED，多个 worker 可以并行
+- 失败的任务按指数退避重试，超过最大次数后标记为失败
+- 处理中途崩溃的任务在锁定超时后会被重新领取
+- 页面通过 image_job_status 接口轮询任务状态
+- 按原始文件的内容哈希（七牛 etag）查 StoredImage，相同图片不再重复处理和上传
+- 每张图片生成多个宽度的 JPEG / WebP 版本（见 images.py），保存在对象的 *_variants 字段中
+"""
+import os
+import shutil
+import tempfile
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from PIL import Image, UnidentifiedImageError
+
+from .images import render_variants, default_url
+from .models import ImageJob, StoredImage, User, Post, Banner
+from .utils import content_hash, upload_image
+from . import timing
+
+
+# 各类任务上传的目录和文件名前缀
+JOB_SPECS = {
+    'avatar': {'directory': 'avatar', 'prefix': 'user'},
+    'cover': {'directory': 'images', 'prefix': 'post'},
+    'banner': {'directory': 'banners', 'prefix': 'banner'},
+}
+
+
+class PermanentJobError(Exception):
+    """重试也不会成功的错误（例如文件不是图片）"""
+
+
+def _get_setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _stored_image(kind, digest):
+    """相同内容的图片已处理过时返回其索引记录"""
+    if not digest:
+        return None
+    return StoredImage.objects.filter(kind=kind, content_hash=digest).first()
+
+
+def enqueue(kind, upload, user, post=None, banner=None):
+    """
+    保存上传的原始文件并登记处理任务
+
+    相同内容的图片已处理过时不再保存和处理，直接复用已有URL，任务创建即完成
+    """
+    digest = content_hash(upload)
+    job = ImageJob(kind=kind, user=user, post=post, banner=banner, content_hash=digest)
+
+    stored = _stored_image(kind, digest)
+    if stored:
+        with transaction.atomic():
+            job.status = 'done'
+            job.result_url = stored.url
+            job.save()
+            _apply_result(job, stored.url, stored.variants)
+        return job
+
+    with timing.span('storage'):
+        job.source.save(upload.name, upload, save=False)
+    job.save()
+    return job
+
+
+def claim_job():
+    """
+    领取一个可执行的任务并标记为处理中，没有任务时返回 None
+    """
+    now = timezone.now()
+    stale = now - timedelta(seconds=_get_setting('IMAGE_JOB_LOCK_TIMEOUT', 600))
+
+    with transaction.atomic():
+        job = (
+            ImageJob.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(status='pending', run_after__lte=now) |
+                Q(status='processing', locked_at__lt=stale)
+            )
+            .order_by('run_after', 'pk')
+            .first()
+        )
+        if job is None:
+            return None
+
+        job.status = 'processing'
+        job.locked_at = now
+        job.attempts += 1
+        job.save(update_fields=['status', 'locked_at', 'attempts', 'updated_at'])
+    return job
+
+
+def _target_id(job):
+    return {'avatar': job.user_id, 'cover': job.post_id, 'banner': job.banner_id}[job.kind]
+
+
+def _resize(job, directory):
+    try:
+        with job.source.open('rb') as source:
+            return render_variants(source, job.kind, directory)
+    except (UnidentifiedImageError, Image.DecompressionBombError) as e:
+        raise PermanentJobError(f'无法识别的图片：{e}')
+    except FileNotFoundError:
+        raise PermanentJobError('原始文件不存在')
+
+
+def _upload(job, files):
+    """上传各个版本，返回版本列表"""
+    spec = JOB_SPECS[job.kind]
+    base_name = f"{spec['prefix']}_{_target_id(job)}_{uuid.uuid4().hex[:8]}"
+    variants = []
+    for width, image_format, path in files:
+        file_name = f'{base_name}_{width}w{os.path.splitext(path)[1]}'
+        url = upload_image(path, spec['directory'], file_name)
+        variants.append({'width': width, 'format': image_format, 'url': url})
+    return variants
+
+
+def _apply_result(job, url, variants):
+    """
+    把结果写回头像/封面/横幅；同一对象已有更新的任务完成时不覆盖
+    """
+    newer = ImageJob.objects.filter(kind=job.kind, status='done', pk__gt=job.pk)
+    if job.kind == 'cover':
+        if newer.filter(post_id=job.post_id).exists():
+            return
+        post = Post.objects.filter(pk=job.post_id).only('pk').first()
+        if post:
+            post.cover_image = url
+            post.cover_variants = variants
+            post.save(update_fields=['cover_image', 'cover_variants', 'updated_at'])
+    elif job.kind == 'banner':
+        # 横幅原图保留在 image 字段中，这里只记录多尺寸版本
+        if newer.filter(banner_id=job.banner_id).exists():
+            return
+        banner = Banner.objects.filter(pk=job.banner_id).first()
+        if banner:
+            banner.image_variants = variants
+            banner.save(update_fields=['image_variants', 'updated_at'])
+    else:
+        if newer.filter(user_id=job.user_id).exists():
+            return
+        User.objects.filter(pk=job.user_id).update(avatar=url, avatar_variants=variants)
+
+
+def _discard_source(job):
+    if job.source:
+        job.source.delete(save=False)
+
+
+def process_job(job):
+    """
+    执行一个已领取的任务，返回处理后的状态
+    """
+    temp_dir = tempfile.mkdtemp()
+    try:
+        stored = _stored_image(job.kind, job.content_hash)
+        if stored:
+            url, variants = stored.url, stored.variants
+        else:
+            variants = _upload(job, _resize(job, temp_dir))
+            url = default_url(variants)
+            if job.content_hash:
+                StoredImage.objects.get_or_create(
+                    kind=job.kind, content_hash=job.content_hash,
+                    defaults={'url': url, 'variants': variants}
+                )
+        with transaction.atomic():
+            _apply_result(job, url, variants)
+            job.status = 'done'
+            job.result_url = url
+            job.last_error = ''
+            job.save(update_fields=['status', 'result_url', 'last_error', 'updated_at'])
+        _discard_source(job)
+        job.save(update_fields=['source'])
+    except Exception as e:
+        job.last_error = str(e)
+        if isinstance(e, PermanentJobError) or job.attempts >= _get_setting('IMAGE_JOB_MAX_ATTEMPTS', 5):
+            job.status = 'failed'
+            _discard_source(job)
+        else:
+            delay = _get_setting('IMAGE_JOB_RETRY_DELAY', 30) * 2 ** (job.attempts - 1)
+            job.status = 'pending'
+            job.run_after = timezone.now() + timedelta(seconds=delay)
+        job.save(update_fields=['status', 'run_after', 'last_error', 'source', 'updated_at'])
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    return job.status
+
+
+def run_pending(limit=None):
+    """
+    依次处理当前可执行的任务，返回处理的任务数
+    """
+    processed = 0
+    while limit is None or processed < limit:
+        job = claim_job()
+        if job is None:
+            break
+        process_job(job)
+        processed += 1
+    return processed
+
+
+def job_status(job):
+    """轮询接口返回的任务状态"""
+    return {
+        'id': job.pk,
+        'kind': job.kind,
+        'status': job.status,
+        'url': job.result_url,
+        'error': job.last_error if job.status == 'failed' else '',
+    }
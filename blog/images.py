@@ -0,0 +1,80 @@
+"""
+多尺寸图片
+
+每张头像、封面、横幅生成若干宽度的 JPEG 和 WebP 版本，
+模板通过 responsive_img 标签输出 srcset/sizes，浏览器按显示尺寸选择合适的文件。
+
+版本列表以 [{'width': 宽度, 'format': 'jpeg'/'webp', 'url': URL}, ...] 的形式
+保存在模型的 *_variants 字段中。
+"""
+import os
+
+from PIL import Image
+
+
+# 每类图片的最大尺寸（宽, 高）和生成的宽度
+MAX_SIZES = {
+    'avatar': (200, 200),
+    'cover': (800, 600),
+    'banner': (1920, 1080),
+}
+VARIANT_WIDTHS = {
+    'avatar': (48, 100, 200),
+    'cover': (240, 480, 800),
+    'banner': (640, 1280, 1920),
+}
+
+# 输出格式：(名称, Pillow 格式, 扩展名, 保存参数)
+FORMATS = (
+    ('jpeg', 'JPEG', '.jpg', {'quality': 85, 'optimize': True, 'progressive': True}),
+    ('webp', 'WEBP', '.webp', {'quality': 80, 'method': 4}),
+)
+
+CONTENT_TYPES = {
+    'jpeg': 'image/jpeg',
+    'webp': 'image/webp',
+}
+
+
+def render_variants(source, kind, directory):
+    """
+    把图片缩放为各个宽度的 JPEG / WebP 文件，写入 directory
+
+    返回 [(宽度, 格式, 文件路径), ...]，按宽度从小到大排列；不会放大原图。
+    """
+    with Image.open(source) as img:
+        # 转换为RGB模式（如果是RGBA）
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        img.thumbnail(MAX_SIZES[kind], Image.Resampling.LANCZOS)
+
+        widths = sorted({width for width in VARIANT_WIDTHS[kind] if width < img.width} | {img.width})
+        variants = []
+        for width in widths:
+            if width == img.width:
+                resized = img
+            else:
+                height = max(1, round(img.height * width / img.width))
+                resized = img.resize((width, height), Image.Resampling.LANCZOS)
+            for name, image_format, ext, options in FORMATS:
+                path = os.path.join(directory, f'{width}w{ext}')
+                resized.save(path, image_format, **options)
+                variants.append((width, name, path))
+    return variants
+
+
+def default_url(variants):
+    """最大宽度的 JPEG 版本，作为 <img src> 和不支持 srcset 时的回退"""
+    jpegs = [variant for variant in variants if variant['format'] == 'jpeg']
+    if not jpegs:
+        return None
+    return max(jpegs, key=lambda variant: variant['width'])['url']
+
+
+def srcset(variants, image_format):
+    """某种格式的 srcset 属性值"""
+    candidates = sorted(
+        (variant for variant in variants or [] if variant.get('format') == image_format),
+        key=lambda variant: variant['width'],
+    )
+    return ', '.join(f"{variant['url']} {variant['width']}w" for variant in candidates)
@@ -0,0 +1,200 @@
+import re
+from urllib.parse import urlencode
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from blog.models import User, Category, Tag, Post, Comment, UserAction
+from blog.pagination import encode_cursor
+from blog import search, related
+
+
+# 行数很少的字典表，全表扫描是正常的
+SMALL_TABLES = ['blog_category', 'blog_tag', 'blog_banner']
+
+SQLITE_SCAN_RE = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$')
+FROM_RE = re.compile(r'\bFROM [`"]?(\w+)[`"]?')
+
+
+class AuditRollback(Exception):
+    """审计结束后回滚审计期间的所有写入"""
+
+
+class Command(BaseCommand):
+    help = (
+        '以匿名用户访问各个公开页面，对页面发出的每条查询执行 EXPLAIN，报告全表扫描和额外排序。'
+        '应在 MySQL 上执行：SQLite 中布尔字段条件写作 WHERE "is_published"，用不上以它开头的组合索引'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0, metavar='N',
+                            help='先生成 N 篇示例文章（含分类、标签、评论、点赞），审计结束后回滚')
+        parser.add_argument('--ignore', action='append', default=None, metavar='TABLE',
+                            help=f'不报告这些表的全表扫描（可重复，默认 {", ".join(SMALL_TABLES)}）')
+        parser.add_argument('--strict', action='store_true', help='发现问题时以错误退出（用于持续集成）')
+
+    def handle(self, *args, **options):
+        if connection.vendor not in ('mysql', 'sqlite'):
+            raise CommandError(f'不支持的数据库：{connection.vendor}')
+
+        self.verbosity = options['verbosity']
+        self.ignored = set(options['ignore'] or SMALL_TABLES)
+        problems = 0
+        try:
+            # 页面访问会写浏览数等数据，全部放在一个事务里，结束后回滚
+            with transaction.atomic():
+                if options['seed']:
+                    self.seed(options['seed'])
+                with override_settings(
+                    ALLOWED_HOSTS=['testserver'],
+                    CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}},
+                    VIEW_COUNT_BUFFER='memory',
+                    VIEW_COUNT_FLUSH_THRESHOLD=1,
+                ):
+                    for name, url in self.public_urls():
+                        problems += self.audit(name, url)
+                raise AuditRollback
+        except AuditRollback:
+            pass
+
+        if problems:
+            message = f'共发现 {problems} 个问题'
+            if options['strict']:
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(message))
+        else:
+            self.stdout.write(self.style.SUCCESS('未发现全表扫描或额外排序'))
+
+    def seed(self, count):
+        """生成示例数据"""
+        author = User.objects.create_user('audit_author', password=None, is_admin=True)
+        readers = [User.objects.create_user(f'audit_reader_{i}', password=None) for i in range(5)]
+        categories = Category.objects.bulk_create([Category(name=f'审计分类{i}') for i in range(5)])
+        tags = Tag.objects.bulk_create([Tag(name=f'审计标签{i}') for i in range(20)])
+
+        posts = Post.objects.bulk_create([
+            Post(
+                title=f'审计文章{i} Django 性能',
+                summary='示例摘要',
+                content=f'# 示例 {i}\n\n示例正文 django python',
+                category=categories[i % len(categories)],
+                author=author,
+                is_vip_only=i % 7 == 0,
+                views=i * 3,
+            )
+            for i in range(count)
+        ])
+        Post.tags.through.objects.bulk_create([
+            Post.tags.through(post_id=post.pk, tag_id=tags[(i + j) % len(tags)].pk)
+            for i, post in enumerate(posts)
+            for j in range(3)
+        ])
+        Comment.objects.bulk_create([
+            Comment(post=post, user=readers[j], content='示例评论')
+            for post in posts
+            for j in range(3)
+        ])
+        UserAction.objects.bulk_create([
+            UserAction(user=reader, post=post, action=action)
+            for post in posts[::3]
+            for reader in readers[:2]
+            for action in ('like', 'favorite')
+        ])
+        search.rebuild_index()
+        related.rebuild_related()
+
+    def public_urls(self):
+        """要审计的公开页面"""
+        post = Post.objects.filter(is_published=True, is_vip_only=False).order_by('-created_at', '-pk').first()
+        if post is None:
+            raise CommandError('没有已发布的文章，请使用 --seed 生成示例数据')
+        older = Post.objects.filter(is_published=True).order_by('-created_at', '-pk')[5:6].first() or post
+        tag = post.tags.first() or Tag.objects.first()
+
+        index = reverse('blog:index')
+        urls = [
+            ('index', index),
+            ('index 分类筛选', f'{index}?{urlencode({"category": post.category_id or ""})}'),
+            ('index VIP筛选', f'{index}?vip_only=1'),
+            ('index 翻页', f'{index}?{urlencode({"cursor": encode_cursor("next", older)})}'),
+            ('post_detail', reverse('blog:post_detail', args=[post.pk])),
+            ('hot_posts', reverse('blog:hot_posts')),
+            ('search', f'{reverse("blog:search")}?{urlencode({"q": post.title.split()[0]})}'),
+            ('categories', reverse('blog:categories')),
+            ('tags', reverse('blog:tags')),
+            ('about', reverse('blog:about')),
+            ('user_state', f'{reverse("blog:user_state")}?post={post.pk}'),
+        ]
+        if post.category_id:
+            urls.append(('category_posts', reverse('blog:category_posts', args=[post.category_id])))
+        if tag:
+            urls.append(('tag_posts', reverse('blog:tag_posts', args=[tag.pk])))
+        return urls
+
+    def audit(self, name, url):
+        """访问一个页面，对其中的查询执行 EXPLAIN，返回发现的问题数"""
+        queries = []
+
+        def capture(execute, sql, params, many, context):
+            if sql.lstrip().upper().startswith('SELECT'):
+                queries.append((sql, params))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(capture):
+            response = Client(raise_request_exception=False).get(url)
+
+        issues = []
+        seen = set()
+        for sql, params in queries:
+            if sql in seen:
+                continue
+            seen.add(sql)
+            for issue in self.explain(sql, params):
+                issues.append((issue, sql))
+
+        style = self.style.WARNING if issues else self.style.SUCCESS
+        self.stdout.write(style(f'[{name}] {url} -> {response.status_code}，{len(queries)} 条查询，{len(issues)} 个问题'))
+        for issue, sql in issues:
+            self.stdout.write(f'    {issue}：{sql[:200]}')
+        return len(issues)
+
+    def explain(self, sql, params):
+        """返回一条查询执行计划中的问题描述列表"""
+        with connection.cursor() as cursor:
+            if connection.vendor == 'mysql':
+                cursor.execute(f'EXPLAIN {sql}', params)
+                columns = [column[0] for column in cursor.description]
+                rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+            else:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+                rows = cursor.fetchall()
+
+        if self.verbosity >= 2:
+            for row in rows:
+                self.stdout.write(f'        {row}')
+
+        # 主表是小表时，分组、排序用到临时表也不报告
+        main_table = FROM_RE.search(sql)
+        small = main_table is not None and main_table.group(1) in self.ignored
+
+        issues = []
+        if connection.vendor == 'mysql':
+            for row in rows:
+                table = row.get('table') or ''
+                extra = row.get('Extra') or ''
+                if row.get('type') == 'ALL' and table not in self.ignored and not table.startswith('<'):
+                    issues.append(f'全表扫描 {table}')
+                if 'Using filesort' in extra and not small:
+                    issues.append(f'额外排序（filesort） {table}')
+        else:
+            for row in rows:
+                detail = row[-1]
+                match = SQLITE_SCAN_RE.match(detail)
+                if match and match.group(1) not in self.ignored:
+                    issues.append(f'全表扫描 {match.group(1)}')
+                if detail.startswith('USE TEMP B-TREE') and not small:
+                    issues.append(f'额外排序（{detail}）')
+        return issues
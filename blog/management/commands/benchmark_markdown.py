@@ -0,0 +1,190 @@
+"""
+Markdown 渲染基准：对比单遍引擎与旧版逐条 re.sub 过滤器的吞吐量。
+两者的输出一致性由 blog/tests.py 中的测试检查。
+"""
+import re
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from blog.markdown_engine import render
+
+
+SAMPLE_BLOCK = """## 性能优化笔记
+
+Django 的 **ORM** 很方便，但要注意 *N+1* 查询，参考 [官方文档](https://docs.djangoproject.com/)。
+同一段落的第二行，包含 `select_related` 和 ~~过时的写法~~。
+
+- 使用 __select_related__ 预取外键
+- 使用 `prefetch_related` 预取多对多
+- 给常用过滤字段加索引
+
+1. 先用 EXPLAIN 分析
+2. 再决定索引
+
+> 过早优化是万恶之源
+
+```python
+posts = Post.objects.select_related('author')
+for post in posts:
+    print(post.author)
+```
+
+---
+
+"""
+
+
+def legacy_markdown(value):
+    """
+    旧版 markdown 过滤器（逐条 re.sub），仅作为基准对照
+    """
+    if not value:
+        return ""
+    
+    # 转换为字符串
+    text = str(value)
+    
+    # 先处理代码块，避免其内容被其他规则影响
+    text = re.sub(r'```(\w+)?\n(.*?)\n```', lambda m: f'<pre><code class="language-{m.group(1) or ""}">{m.group(2)}</code></pre>', text, flags=re.DOTALL)
+    
+    # 处理行内代码
+    text = re.sub(r'`([^`]+)`', r'<code>\1</code>', text)
+    
+    # 处理标题
+    text = re.sub(r'^# (.*?)$', r'<h1>\1</h1>', text, flags=re.MULTILINE)
+    text = re.sub(r'^## (.*?)$', r'<h2>\1</h2>', text, flags=re.MULTILINE)
+    text = re.sub(r'^### (.*?)$', r'<h3>\1</h3>', text, flags=re.MULTILINE)
+    text = re.sub(r'^#### (.*?)$', r'<h4>\1</h4>', text, flags=re.MULTILINE)
+    text = re.sub(r'^##### (.*?)$', r'<h5>\1</h5>', text, flags=re.MULTILINE)
+    text = re.sub(r'^###### (.*?)$', r'<h6>\1</h6>', text, flags=re.MULTILINE)
+    
+    # 处理粗体
+    text = re.sub(r'\*\*(.*?)\*\*', r'<strong>\1</strong>', text)
+    text = re.sub(r'__(.*?)__', r'<strong>\1</strong>', text)
+    
+    # 处理斜体
+    text = re.sub(r'\*(.*?)\*', r'<em>\1</em>', text)
+    text = re.sub(r'_(.*?)_', r'<em>\1</em>', text)
+    
+    # 处理删除线
+    text = re.sub(r'~~(.*?)~~', r'<del>\1</del>', text)
+    
+    # 处理链接
+    text = re.sub(r'\[([^\]]+)\]\(([^)]+)\)', r'<a href="\2" target="_blank">\1</a>', text)
+    
+    # 处理图片
+    text = re.sub(r'!\[([^\]]*)\]\(([^)]+)\)', r'<img src="\2" alt="\1" class="img-fluid" />', text)
+    
+    # 处理引用
+    text = re.sub(r'^> (.*?)$', r'<blockquote>\1</blockquote>', text, flags=re.MULTILINE)
+    
+    # 处理无序列表
+    lines = text.split('\n')
+    in_list = False
+    result_lines = []
+    
+    for line in lines:
+        if re.match(r'^[-*+] ', line):
+            if not in_list:
+                result_lines.append('<ul>')
+                in_list = True
+            list_item = re.sub(r'^[-*+] (.*)', r'<li>\1</li>', line)
+            result_lines.append(list_item)
+        else:
+            if in_list:
+                result_lines.append('</ul>')
+                in_list = False
+            result_lines.append(line)
+    
+    if in_list:
+        result_lines.append('</ul>')
+    
+    text = '\n'.join(result_lines)
+    
+    # 处理有序列表
+    lines = text.split('\n')
+    in_ordered_list = False
+    result_lines = []
+    
+    for line in lines:
+        if re.match(r'^\d+\. ', line):
+            if not in_ordered_list:
+                result_lines.append('<ol>')
+                in_ordered_list = True
+            list_item = re.sub(r'^\d+\. (.*)', r'<li>\1</li>', line)
+            result_lines.append(list_item)
+        else:
+            if in_ordered_list:
+                result_lines.append('</ol>')
+                in_ordered_list = False
+            result_lines.append(line)
+    
+    if in_ordered_list:
+        result_lines.append('</ol>')
+    
+    text = '\n'.join(result_lines)
+    
+    # 处理水平分割线
+    text = re.sub(r'^---$', r'<hr>', text, flags=re.MULTILINE)
+    text = re.sub(r'^\*\*\*$', r'<hr>', text, flags=re.MULTILINE)
+    
+    # 处理换行符
+    text = text.replace('\n\n', '</p><p>')
+    text = text.replace('\n', '<br>')
+    
+    # 添加段落标签
+    if text and not text.startswith('<'):
+        text = '<p>' + text + '</p>'
+    
+    # 清理多余的空段落
+    text = re.sub(r'<p>\s*</p>', '', text)
+    text = re.sub(r'<p>(<h[1-6]>.*?</h[1-6]>)</p>', r'\1', text)
+    text = re.sub(r'<p>(<ul>.*?</ul>)</p>', r'\1', text, flags=re.DOTALL)
+    text = re.sub(r'<p>(<ol>.*?</ol>)</p>', r'\1', text, flags=re.DOTALL)
+    text = re.sub(r'<p>(<blockquote>.*?</blockquote>)</p>', r'\1', text)
+    text = re.sub(r'<p>(<hr>)</p>', r'\1', text)
+    text = re.sub(r'<p>(<pre>.*?</pre>)</p>', r'\1', text, flags=re.DOTALL)
+    
+    return text
+
+
+class Command(BaseCommand):
+    help = '对比 Markdown 渲染引擎与旧版过滤器的吞吐量'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', default='10,100,1000',
+            help='文档大小（KB），逗号分隔，默认 10,100,1000'
+        )
+        parser.add_argument('--repeat', type=int, default=3, help='每个大小重复次数，取最快一次')
+        parser.add_argument('--skip-legacy', action='store_true', help='不跑旧版过滤器（大文档时很慢）')
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(size) for size in options['sizes'].split(',')]
+        except ValueError:
+            raise CommandError('--sizes 需要是逗号分隔的整数')
+
+        implementations = [('engine', render)]
+        if not options['skip_legacy']:
+            implementations.append(('legacy', legacy_markdown))
+
+        self.stdout.write(f"{'大小':>8} {'实现':>8} {'耗时(ms)':>10} {'吞吐(MB/s)':>12}")
+        for size_kb in sizes:
+            document = self.build_document(size_kb * 1024)
+            megabytes = len(document.encode('utf-8')) / (1024 * 1024)
+            for name, func in implementations:
+                best = min(self.time_once(func, document) for _ in range(options['repeat']))
+                self.stdout.write(
+                    f'{size_kb:>6}KB {name:>8} {best * 1000:>10.1f} {megabytes / best:>12.2f}'
+                )
+
+    def build_document(self, size):
+        block_size = len(SAMPLE_BLOCK.encode('utf-8'))
+        return SAMPLE_BLOCK * max(1, size // block_size)
+
+    def time_once(self, func, document):
+        start = time.perf_counter()
+        func(document)
+        return time.perf_counter() - start
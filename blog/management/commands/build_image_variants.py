@@ -0,0 +1,66 @@
+import requests
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from blog import image_jobs
+from blog.models import Banner, Post, User
+from blog.storage import get_image_storage
+
+
+class Command(BaseCommand):
+    help = '为还没有多尺寸版本的头像、文章封面、横幅登记图片处理任务（由 run_image_worker 处理）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', action='append', choices=['avatar', 'cover', 'banner'],
+                            help='只处理指定类型，可重复指定；默认全部')
+
+    def handle(self, *args, **options):
+        kinds = options['kind'] or ['avatar', 'cover', 'banner']
+        self.storage = get_image_storage()
+        self.base_url = self.storage.url('')
+        queued = 0
+
+        if 'avatar' in kinds:
+            users = User.objects.exclude(Q(avatar__isnull=True) | Q(avatar='')).filter(avatar_variants=[])
+            for user in users.iterator():
+                queued += self._enqueue('avatar', user.avatar, user)
+
+        if 'cover' in kinds:
+            posts = (
+                Post.objects.exclude(Q(cover_image__isnull=True) | Q(cover_image=''))
+                .filter(cover_variants=[])
+                .select_related('author')
+                .only('pk', 'cover_image', 'author')
+            )
+            for post in posts.iterator():
+                queued += self._enqueue('cover', post.cover_image, post.author, post=post)
+
+        if 'banner' in kinds:
+            banners = Banner.objects.exclude(image='').filter(image_variants=[])
+            if banners.exists():
+                admin = User.objects.filter(Q(is_superuser=True) | Q(is_admin=True)).order_by('pk').first()
+                if admin is None:
+                    raise CommandError('没有管理员账号，无法登记横幅任务')
+                for banner in banners.iterator():
+                    queued += self._enqueue('banner', banner.image.url, admin, banner=banner)
+
+        self.stdout.write(self.style.SUCCESS(f'已登记 {queued} 个任务'))
+
+    def _fetch(self, url):
+        if url.startswith(self.base_url):
+            with self.storage.open(url[len(self.base_url):]) as f:
+                return f.read()
+        response = requests.get(url, timeout=30)
+        response.raise_for_status()
+        return response.content
+
+    def _enqueue(self, kind, url, user, **target):
+        try:
+            data = self._fetch(url)
+        except Exception as e:
+            self.stderr.write(f'跳过 {url}：{e}')
+            return 0
+        name = url.rsplit('/', 1)[-1] or f'{kind}.jpg'
+        image_jobs.enqueue(kind, ContentFile(data, name=name), user, **target)
+        return 1
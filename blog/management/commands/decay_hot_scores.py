@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from blog.hot import decay_scores, rebuild_scores
+
+
+class Command(BaseCommand):
+    help = '按时间衰减文章热度（定时执行），或用 --rebuild 从行为记录重新计算热度'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=float, default=1, help='距上次衰减的小时数，应与定时执行的间隔一致')
+        parser.add_argument('--rebuild', action='store_true', help='从点赞、收藏、评论记录和浏览数重新计算全部热度')
+        parser.add_argument('--batch-size', type=int, default=1000, help='重新计算时每批处理的文章数')
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            total = rebuild_scores(batch_size=options['batch_size'], stdout=self.stdout)
+            self.stdout.write(self.style.SUCCESS(f'共重新计算 {total} 篇文章的热度'))
+            return
+
+        updated = decay_scores(options['hours'])
+        self.stdout.write(self.style.SUCCESS(f'已衰减 {updated} 篇文章的热度（{options["hours"]} 小时）'))
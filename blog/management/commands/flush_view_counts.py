@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from blog import view_counter
+
+
+class Command(BaseCommand):
+    help = '把缓冲中的文章浏览数批量写回数据库'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='每批读取的文章数')
+
+    def handle(self, *args, **options):
+        flushed = view_counter.flush()
+        flushed += view_counter.drain_cache(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'已写回 {flushed} 次浏览'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from blog.related import rebuild_related
+
+
+class Command(BaseCommand):
+    help = '按标签相似度全量重建相关文章'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200, help='每批写入的文章数')
+
+    def handle(self, *args, **options):
+        total = rebuild_related(batch_size=options['batch_size'], stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f'共处理 {total} 篇文章'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from blog.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = '全量重建文章全文搜索索引'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200, help='每批索引的文章数')
+
+    def handle(self, *args, **options):
+        indexed = rebuild_index(batch_size=options['batch_size'], stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f'共索引 {indexed} 篇文章'))
@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from blog.models import Post, UserAction
+
+
+class Command(BaseCommand):
+    help = '根据 UserAction 重新计算文章的点赞数和收藏数，修复计数偏差'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='每批处理的文章数')
+        parser.add_argument('--dry-run', action='store_true', help='只报告偏差，不写数据库')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+
+        checked = 0
+        fixed = 0
+        last_pk = 0
+
+        while True:
+            # 按主键分段，避免大表 OFFSET 扫描
+            posts = list(
+                Post.objects.filter(pk__gt=last_pk)
+                .order_by('pk')
+                .only('pk', 'likes', 'favorites')[:batch_size]
+            )
+            if not posts:
+                break
+            last_pk = posts[-1].pk
+            checked += len(posts)
+
+            counts = {}
+            rows = (
+                UserAction.objects.filter(post_id__gte=posts[0].pk, post_id__lte=last_pk)
+                .values('post_id', 'action')
+                .annotate(total=Count('id'))
+                .order_by()
+            )
+            for row in rows:
+                counts[(row['post_id'], row['action'])] = row['total']
+
+            drifted = []
+            for post in posts:
+                likes = counts.get((post.pk, 'like'), 0)
+                favorites = counts.get((post.pk, 'favorite'), 0)
+                if post.likes != likes or post.favorites != favorites:
+                    self.stdout.write(
+                        f'文章 {post.pk}: 点赞 {post.likes} -> {likes}，收藏 {post.favorites} -> {favorites}'
+                    )
+                    post.likes = likes
+                    post.favorites = favorites
+                    drifted.append(post)
+
+            if drifted and not dry_run:
+                Post.objects.bulk_update(drifted, ['likes', 'favorites'])
+            fixed += len(drifted)
+
+        action = '发现' if dry_run else '修复'
+        self.stdout.write(self.style.SUCCESS(f'共检查 {checked} 篇文章，{action} {fixed} 篇计数偏差'))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from blog.models import Post, Comment
+
+
+class Command(BaseCommand):
+    help = '按已审核评论重新计算所有文章的评论数'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='每批更新的文章数')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        updated = 0
+        last_pk = 0
+        while True:
+            # 按主键分段更新，避免长时间锁住整张表
+            pks = list(
+                Post.objects.filter(pk__gt=last_pk)
+                .order_by('pk')
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not pks:
+                break
+            last_pk = pks[-1]
+
+            updated += Post.objects.filter(pk__gte=pks[0], pk__lte=last_pk).update(
+                comment_count=Comment.approved_count_subquery()
+            )
+
+        self.stdout.write(self.style.SUCCESS(f'已重新计算 {updated} 篇文章的评论数'))
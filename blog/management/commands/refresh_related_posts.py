@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from blog import related
+
+
+class Command(BaseCommand):
+    help = '增量刷新文章标签、分类或发布状态变化后登记的相关文章'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200, help='每批处理的登记数')
+        parser.add_argument('--loop', action='store_true', help='常驻运行，持续处理新的登记')
+        parser.add_argument('--sleep', type=float, default=5, help='常驻运行时没有登记的轮询间隔（秒）')
+
+    def handle(self, *args, **options):
+        if not options['loop']:
+            total = 0
+            while True:
+                refreshed = related.refresh_pending(batch_size=options['batch_size'])
+                if refreshed is None:
+                    break
+                total += refreshed
+            self.stdout.write(self.style.SUCCESS(f'共刷新 {total} 篇文章'))
+            return
+
+        self.stdout.write('相关文章刷新已启动，按 Ctrl+C 退出')
+        try:
+            while True:
+                close_old_connections()
+                refreshed = related.refresh_pending(batch_size=options['batch_size'])
+                if refreshed is None:
+                    time.sleep(options['sleep'])
+                    continue
+                self.stdout.write(f'已刷新 {refreshed} 篇文章')
+        except KeyboardInterrupt:
+            self.stdout.write('已退出')
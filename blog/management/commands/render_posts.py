@@ -0,0 +1,82 @@
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import os
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from blog.markdown_engine import rendered_digest, render_content
+from blog.models import Post
+
+
+def render_batch(items):
+    """在子进程中渲染一批 (pk, content)，返回 (pk, content_hash, content_html)"""
+    return [(pk, rendered_digest(content), render_content(content)) for pk, content in items]
+
+
+class Command(BaseCommand):
+    help = '重新渲染文章正文，回填 content_html / content_hash'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='渲染进程数')
+        parser.add_argument('--batch-size', type=int, default=200, help='每批渲染的文章数')
+        parser.add_argument('--force', action='store_true', help='忽略内容摘要，全部重新渲染')
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        batch_size = options['batch_size']
+        force = options['force']
+
+        # 子进程只做渲染，数据库读写都在主进程；先关闭连接避免被子进程继承
+        connections.close_all()
+
+        rendered = 0
+        pending = set()
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for items in self.iter_batches(batch_size, force):
+                pending.add(executor.submit(render_batch, items))
+                # 限制在途批次数量，避免把整张表的正文都读进内存
+                if len(pending) >= workers * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    rendered += self.save_results(done)
+
+            done, _ = wait(pending)
+            rendered += self.save_results(done)
+
+        if rendered:
+            self.stdout.write(self.style.SUCCESS(f'共重新渲染 {rendered} 篇文章'))
+        else:
+            self.stdout.write(self.style.SUCCESS('所有文章都已是最新渲染结果'))
+
+    def save_results(self, futures):
+        saved = 0
+        for future in futures:
+            posts = [
+                Post(pk=pk, content_hash=digest, content_html=html)
+                for pk, digest, html in future.result()
+            ]
+            Post.objects.bulk_update(posts, ['content_hash', 'content_html'])
+            saved += len(posts)
+        if saved:
+            self.stdout.write(f'已保存 {saved} 篇')
+        return saved
+
+    def iter_batches(self, batch_size, force):
+        """按主键分段读取需要渲染的文章"""
+        last_pk = 0
+        while True:
+            rows = list(
+                Post.objects.filter(pk__gt=last_pk)
+                .order_by('pk')
+                .values_list('pk', 'content', 'content_hash')[:batch_size]
+            )
+            if not rows:
+                break
+            last_pk = rows[-1][0]
+
+            items = [
+                (pk, content)
+                for pk, content, digest in rows
+                if force or digest != rendered_digest(content)
+            ]
+            if items:
+                yield items
@@ -0,0 +1,23 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from blog.stats import rollup_daily_stats, rollup_watermark
+
+
+class Command(BaseCommand):
+    help = '增量汇总每日统计（DailyStats），从上次的水位线开始处理'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='从指定日期（YYYY-MM-DD）开始重新汇总')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = date.fromisoformat(options['since'])
+            except ValueError:
+                raise CommandError('--since 需要是 YYYY-MM-DD 格式的日期')
+
+        days = rollup_daily_stats(since=since)
+        self.stdout.write(self.style.SUCCESS(f'已汇总 {days} 天，当前水位线：{rollup_watermark()}'))
@@ -0,0 +1,38 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from blog import image_jobs
+
+
+class Command(BaseCommand):
+    help = '处理图片任务队列（缩放并上传头像、文章封面）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='处理完当前可执行的任务后退出')
+        parser.add_argument('--sleep', type=float, default=None, help='队列为空时的轮询间隔（秒）')
+
+    def handle(self, *args, **options):
+        sleep = options['sleep']
+        if sleep is None:
+            sleep = getattr(settings, 'IMAGE_JOB_POLL_INTERVAL', 2)
+
+        if options['once']:
+            processed = image_jobs.run_pending()
+            self.stdout.write(self.style.SUCCESS(f'已处理 {processed} 个任务'))
+            return
+
+        self.stdout.write('图片任务 worker 已启动，按 Ctrl+C 退出')
+        try:
+            while True:
+                close_old_connections()
+                job = image_jobs.claim_job()
+                if job is None:
+                    time.sleep(sleep)
+                    continue
+                image_jobs.process_job(job)
+                self.stdout.write(str(job))
+        except KeyboardInterrupt:
+            self.stdout.write('worker 已退出')
@@ -0,0 +1,23 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from blog.models import Banner
+from blog.storage import get_image_storage
+
+
+class Command(BaseCommand):
+    help = '把保存在本地 MEDIA_ROOT 中的横幅图片上传到图片存储（切换到七牛云后执行一次）'
+
+    def handle(self, *args, **options):
+        storage = get_image_storage()
+        synced = 0
+        for banner in Banner.objects.exclude(image=''):
+            name = banner.image.name
+            if not default_storage.exists(name) or storage.exists(name):
+                continue
+            with default_storage.open(name, 'rb') as f:
+                saved = storage.save(name, f)
+            if saved != name:
+                Banner.objects.filter(pk=banner.pk).update(image=saved)
+            synced += 1
+        self.stdout.write(self.style.SUCCESS(f'已同步 {synced} 张横幅图片'))
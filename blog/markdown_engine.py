@@ -0,0 +1,368 @@
+"""
+单遍 Markdown 渲染引擎
+
+先按行做一次块级扫描（代码块、标题、引用、列表、表格、分割线、段落），
+再对每个块的文本做一次行内扫描（行内代码、图片、链接、粗体、斜体、删除线）。
+所有正则在模块加载时编译，输出写入同一个列表缓冲区，最后一次性 join。
+
+与旧版逐条 re.sub 的过滤器相比，以下行为做了修正：
+- 代码块内容会被转义，不再被行内规则和换行替换处理
+- 图片语法 ![alt](src) 能正确渲染为 <img>
+- 下划线斜体要求两侧不是单词字符，snake_case 不会被误判
+- *** 渲染为分割线
+- 段落、列表、标题不会再产生多余或错位的 <p>/<br> 标签
+
+与原先浏览器端 marked.js（GFM）一致支持：按缩进嵌套的列表、连续多行的引用（内部递归渲染）、
+带对齐方式的表格。
+"""
+import hashlib
+import re
+from html import escape
+
+from django.utils.html import linebreaks
+
+from . import timing
+
+
+# 渲染结果的格式变化时加一，共享缓存中旧版本的渲染结果随之失效
+ENGINE_VERSION = 2
+
+# 块级规则
+FENCE_RE = re.compile(r'^```(\w+)?\s*$')
+HEADING_RE = re.compile(r'^(#{1,6}) (.*)$')
+QUOTE_RE = re.compile(r'^ {0,3}> ?(.*)$')
+UL_ITEM_RE = re.compile(r'^[-*+] (.*)$')
+OL_ITEM_RE = re.compile(r'^\d+\. (.*)$')
+HR_RE = re.compile(r'^(?:---|\*\*\*)$')
+TABLE_DELIMITER_RE = re.compile(r'^:?-+:?$')
+TABLE_CELL_SPLIT_RE = re.compile(r'(?<!\\)\|')
+
+# 引用最多嵌套的层数，避免几千个 > 这类内容导致递归过深
+MAX_QUOTE_DEPTH = 16
+
+# 行内规则：按优先级合并成一个正则，一次扫描
+INLINE_RE = re.compile(
+    r'`(?P<code>[^`]+)`'
+    r'|!\[(?P<img_alt>[^\]]*)\]\((?P<img_src>[^)]+)\)'
+    r'|\[(?P<link_text>[^\]]+)\]\((?P<link_href>[^)]+)\)'
+    r'|\*\*(?P<strong>.+?)\*\*'
+    r'|__(?P<strong_u>.+?)__'
+    r'|\*(?P<em>[^*]+?)\*'
+    r'|(?<!\w)_(?P<em_u>[^_]+?)_(?!\w)'
+    r'|~~(?P<del>.+?)~~'
+)
+
+
+def render_inline(text, out):
+    """
+    渲染行内语法，结果追加到 out
+    """
+    pos = 0
+    for match in INLINE_RE.finditer(text):
+        start = match.start()
+        if start > pos:
+            out.append(text[pos:start])
+        pos = match.end()
+
+        kind = match.lastgroup
+        if kind == 'code':
+            out.append('<code>')
+            out.append(escape(match.group('code'), quote=False))
+            out.append('</code>')
+        elif kind == 'img_src':
+            out.append(
+                f'<img src="{match.group("img_src")}" alt="{match.group("img_alt")}" class="img-fluid" />'
+            )
+        elif kind == 'link_href':
+            out.append(f'<a href="{match.group("link_href")}" target="_blank">')
+            render_inline(match.group('link_text'), out)
+            out.append('</a>')
+        elif kind in ('strong', 'strong_u'):
+            out.append('<strong>')
+            render_inline(match.group(kind), out)
+            out.append('</strong>')
+        elif kind in ('em', 'em_u'):
+            out.append('<em>')
+            render_inline(match.group(kind), out)
+            out.append('</em>')
+        elif kind == 'del':
+            out.append('<del>')
+            render_inline(match.group('del'), out)
+            out.append('</del>')
+
+    if pos < len(text):
+        out.append(text[pos:])
+
+
+def _indent(line):
+    """行首缩进的宽度（制表符按 4 个空格计）"""
+    width = 0
+    for char in line:
+        if char == ' ':
+            width += 1
+        elif char == '\t':
+            width += 4
+        else:
+            break
+    return width
+
+
+def _list_item(line):
+    """列表项返回 (缩进, 'ul'/'ol', 内容)，否则返回 None"""
+    stripped = line.lstrip()
+    item = UL_ITEM_RE.match(stripped)
+    if item:
+        return _indent(line), 'ul', item.group(1)
+    item = OL_ITEM_RE.match(stripped)
+    if item:
+        return _indent(line), 'ol', item.group(1)
+    return None
+
+
+def _render_list(lines, out):
+    """
+    渲染一个列表块（可嵌套）：缩进比上一项深的列表项开启子列表，
+    缩进的非列表项行接在当前列表项后面
+    """
+    stack = []  # [(缩进, 标签)]
+    for line in lines:
+        if not line.strip():
+            continue
+        item = _list_item(line)
+        if item is None:
+            out.append(' ')
+            render_inline(line.strip(), out)
+            continue
+
+        indent, tag, text = item
+        while stack and indent < stack[-1][0]:
+            out.append(f'</li></{stack.pop()[1]}>')
+        if stack and indent == stack[-1][0]:
+            out.append('</li>')
+            if tag != stack[-1][1]:
+                out.append(f'</{stack.pop()[1]}>')
+        if not stack or indent > stack[-1][0]:
+            out.append(f'<{tag}>')
+            stack.append((indent, tag))
+        out.append('<li>')
+        render_inline(text, out)
+
+    while stack:
+        out.append(f'</li></{stack.pop()[1]}>')
+
+
+def _split_row(line):
+    """表格行按未转义的 | 切分为单元格"""
+    line = line.strip()
+    if line.startswith('|'):
+        line = line[1:]
+    if line.endswith('|') and not line.endswith('\\|'):
+        line = line[:-1]
+    return [cell.strip().replace('\\|', '|') for cell in TABLE_CELL_SPLIT_RE.split(line)]
+
+
+def _render_table(header, alignments, rows, out):
+    out.append('<table class="table table-bordered"><thead><tr>')
+    for index, cell in enumerate(header):
+        _render_cell('th', cell, alignments[index] if index < len(alignments) else None, out)
+    out.append('</tr></thead>')
+    if rows:
+        out.append('<tbody>')
+        for row in rows:
+            out.append('<tr>')
+            for index in range(len(header)):
+                cell = row[index] if index < len(row) else ''
+                _render_cell('td', cell, alignments[index] if index < len(alignments) else None, out)
+            out.append('</tr>')
+        out.append('</tbody>')
+    out.append('</table>')
+
+
+def _render_cell(tag, text, align, out):
+    out.append(f'<{tag} style="text-align: {align}">' if align else f'<{tag}>')
+    render_inline(text, out)
+    out.append(f'</{tag}>')
+
+
+def _table_alignments(line):
+    """表格分隔行（如 |:---|:---:|）返回各列的对齐方式，不是分隔行时返回 None"""
+    if '|' not in line and '-' not in line:
+        return None
+    cells = _split_row(line)
+    if not cells or not all(TABLE_DELIMITER_RE.match(cell) for cell in cells):
+        return None
+    alignments = []
+    for cell in cells:
+        if cell.startswith(':') and cell.endswith(':'):
+            alignments.append('center')
+        elif cell.endswith(':'):
+            alignments.append('right')
+        elif cell.startswith(':'):
+            alignments.append('left')
+        else:
+            alignments.append(None)
+    return alignments
+
+
+def render(text, depth=0):
+    """
+    把 Markdown 文本渲染为 HTML 字符串
+
+    depth 是引用的嵌套层数（引用内容递归渲染），达到 MAX_QUOTE_DEPTH 后更深的 > 按普通文本输出
+    """
+    out = []
+    lines = text.replace('\r\n', '\n').split('\n')
+
+    paragraph = []   # 当前段落的行
+
+    def close_paragraph():
+        if paragraph:
+            out.append('<p>')
+            for index, line in enumerate(paragraph):
+                if index:
+                    out.append('<br>')
+                render_inline(line, out)
+            out.append('</p>')
+            paragraph.clear()
+
+    i = 0
+    count = len(lines)
+    while i < count:
+        line = lines[i]
+
+        # 代码块
+        fence = FENCE_RE.match(line)
+        if fence:
+            end = i + 1
+            while end < count and lines[end].rstrip() != '```':
+                end += 1
+            if end < count:
+                close_paragraph()
+                language = fence.group(1) or ''
+                code = '\n'.join(lines[i + 1:end])
+                out.append(f'<pre><code class="language-{language}">')
+                out.append(escape(code, quote=False))
+                out.append('</code></pre>')
+                i = end + 1
+                continue
+
+        if not line.strip():
+            close_paragraph()
+            i += 1
+            continue
+
+        if HR_RE.match(line):
+            close_paragraph()
+            out.append('<hr>')
+            i += 1
+            continue
+
+        heading = HEADING_RE.match(line)
+        if heading:
+            close_paragraph()
+            level = len(heading.group(1))
+            out.append(f'<h{level}>')
+            render_inline(heading.group(2), out)
+            out.append(f'</h{level}>')
+            i += 1
+            continue
+
+        # 引用：连续的 > 行去掉标记后作为一段 Markdown 递归渲染（可包含段落、列表、嵌套引用）
+        if depth < MAX_QUOTE_DEPTH and QUOTE_RE.match(line):
+            close_paragraph()
+            end = i
+            quoted = []
+            while end < count and QUOTE_RE.match(lines[end]):
+                quoted.append(QUOTE_RE.match(lines[end]).group(1))
+                end += 1
+            out.append('<blockquote>')
+            out.append(render('\n'.join(quoted), depth + 1))
+            out.append('</blockquote>')
+            i = end
+            continue
+
+        # 列表：收集到空行后不再是列表项或缩进行为止，按缩进渲染嵌套列表
+        if _list_item(line):
+            close_paragraph()
+            end = i + 1
+            while end < count:
+                current = lines[end]
+                if not current.strip():
+                    following = lines[end + 1] if end + 1 < count else ''
+                    if following.strip() and (_list_item(following) or _indent(following) >= 2):
+                        end += 1
+                        continue
+                    break
+                if FENCE_RE.match(current) or (
+                    not _list_item(current) and _indent(current) < 2
+                ):
+                    break
+                end += 1
+            _render_list(lines[i:end], out)
+            i = end
+            continue
+
+        # 表格：表头行 + 分隔行，之后直到空行或不含 | 的行都是表格行
+        if '|' in line and i + 1 < count:
+            alignments = _table_alignments(lines[i + 1])
+            if alignments is not None:
+                close_paragraph()
+                header = _split_row(line)
+                end = i + 2
+                rows = []
+                while end < count and lines[end].strip() and '|' in lines[end]:
+                    rows.append(_split_row(lines[end]))
+                    end += 1
+                _render_table(header, alignments, rows, out)
+                i = end
+                continue
+
+        paragraph.append(line)
+        i += 1
+
+    close_paragraph()
+
+    return ''.join(out)
+
+
+# 内容检测：任一规则命中即认为是 Markdown
+MARKDOWN_INDICATOR_RE = re.compile(
+    r'^#{1,6}\s'        # 标题
+    r'|\*\*.*?\*\*'     # 粗体
+    r'|\[.*?\]\(.*?\)'  # 链接
+    r'|^\s*[-*+]\s'     # 列表
+    r'|^\s*\d+\.\s'     # 有序列表
+    r'|```'             # 代码块
+    r'|`[^`]+`'         # 行内代码
+    r'|^>\s'            # 引用
+    r'|^\|.*\|\s*$',    # 表格
+    re.MULTILINE,
+)
+
+
+def looks_like_markdown(text):
+    """检测文本是否可能是 Markdown 格式"""
+    return MARKDOWN_INDICATOR_RE.search(text) is not None
+
+
+def content_digest(text):
+    """文本内容的摘要，用于判断内容是否变化"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def rendered_digest(text):
+    """
+    已渲染正文（Post.content_html）对应的摘要：包含引擎版本，
+    引擎升级后旧的渲染结果与新摘要不一致，保存文章或执行 render_posts 时会重新渲染
+    """
+    return content_digest(f'engine:{ENGINE_VERSION}\n{text}')
+
+
+def render_content(text):
+    """
+    渲染文章正文：Markdown 内容走渲染引擎，普通文本按段落和换行转义输出
+    """
+    with timing.span('markdown'):
+        if looks_like_markdown(text):
+            return render(text)
+        return linebreaks(text, autoescape=True)
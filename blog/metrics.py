@@ -0,0 +1,132 @@
+"""
+请求指标
+
+MetricsMiddleware 按视图记录每个请求的 SQL 查询数、数据库耗时、模板渲染耗时和总耗时，
+累加到进程内的直方图中，由 /metrics 接口以 Prometheus 文本格式输出。
+
+- settings.METRICS_ENABLED 为 False 时中间件在启动时被移除（MiddlewareNotUsed），请求路径上没有任何开销
+- 数据库耗时和模板耗时由 timing 模块统计（模板只计最外层，include 不重复计算）
+- 直方图保存在各个进程内，多 worker 部署时每次抓取到的是处理该请求的 worker 的数据，
+  按 instance 区分或在 Prometheus 中 sum 聚合
+"""
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from . import timing
+
+
+# 耗时（秒）和查询数的直方图分桶
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+# 指标名 -> (说明, 分桶)
+HISTOGRAMS = {
+    'blog_request_duration_seconds': ('请求总耗时（秒）', DURATION_BUCKETS),
+    'blog_request_db_queries': ('每个请求的 SQL 查询数', QUERY_COUNT_BUCKETS),
+    'blog_request_db_duration_seconds': ('每个请求的数据库耗时（秒）', DURATION_BUCKETS),
+    'blog_request_template_duration_seconds': ('每个请求的模板渲染耗时（秒）', DURATION_BUCKETS),
+}
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Histogram:
+    """累积分桶直方图（与 Prometheus histogram 的语义一致）"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    """进程内的指标：按 (指标名, 视图) 保存直方图，按 (视图, 状态码) 计数请求"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {}
+            self.requests = defaultdict(int)
+
+    def record(self, view, status, values):
+        """values: {指标名: 观测值}"""
+        with self._lock:
+            self.requests[(view, status)] += 1
+            for name, value in values.items():
+                key = (name, view)
+                if key not in self.histograms:
+                    self.histograms[key] = Histogram(HISTOGRAMS[name][1])
+                self.histograms[key].observe(value)
+
+    def render(self):
+        """Prometheus 文本格式"""
+        with self._lock:
+            lines = [
+                '# HELP blog_requests_total 请求数',
+                '# TYPE blog_requests_total counter',
+            ]
+            for (view, status), count in sorted(self.requests.items()):
+                lines.append(f'blog_requests_total{{view="{_escape(view)}",status="{status}"}} {count}')
+
+            for name, (description, _) in HISTOGRAMS.items():
+                lines.append(f'# HELP {name} {description}')
+                lines.append(f'# TYPE {name} histogram')
+                for (metric, view), histogram in sorted(self.histograms.items()):
+                    if metric != name:
+                        continue
+                    label = f'view="{_escape(view)}"'
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        lines.append(f'{name}_bucket{{{label},le="{bound}"}} {count}')
+                    lines.append(f'{name}_bucket{{{label},le="+Inf"}} {histogram.count}')
+                    lines.append(f'{name}_sum{{{label}}} {round(histogram.sum, 6)}')
+                    lines.append(f'{name}_count{{{label}}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = Registry()
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else 'unmatched'
+
+
+class MetricsMiddleware:
+    """记录每个请求的查询数、数据库耗时、模板耗时和总耗时"""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICS_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        timing.install_template_timing()
+
+    def __call__(self, request):
+        with timing.collect() as timings:
+            response = self.get_response(request)
+            duration = timings.elapsed()
+
+        registry.record(_view_name(request), response.status_code, {
+            'blog_request_duration_seconds': duration,
+            'blog_request_db_queries': timings.counts['db'],
+            'blog_request_db_duration_seconds': timings.durations['db'],
+            'blog_request_template_duration_seconds': timings.durations['render'],
+        })
+        return response
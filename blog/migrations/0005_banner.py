@@ -0,0 +1,35 @@
+# Generated by Django 4.2.30 on 2026-10-18 02:41
+# Banner 模型此前缺少迁移
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0004_add_vip_features'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Banner',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=200, verbose_name='横幅标题')),
+                ('subtitle', models.CharField(blank=True, max_length=300, verbose_name='副标题')),
+                ('image', models.ImageField(upload_to='banners/', verbose_name='横幅图片')),
+                ('external_url', models.URLField(blank=True, verbose_name='外部链接')),
+                ('is_active', models.BooleanField(default=True, verbose_name='是否启用')),
+                ('order', models.PositiveIntegerField(default=0, verbose_name='排序')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+                ('post', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='blog.post', verbose_name='关联文章')),
+            ],
+            options={
+                'verbose_name': '轮播横幅',
+                'verbose_name_plural': '轮播横幅',
+                'ordering': ['order', '-created_at'],
+            },
+        ),
+    ]
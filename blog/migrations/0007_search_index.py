@@ -0,0 +1,40 @@
+# Generated by Django 4.2.30 on 2026-10-18 02:43
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0006_post_content_html'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='blog.post', verbose_name='文章')),
+                ('length', models.PositiveIntegerField(default=0, verbose_name='词项总数')),
+                ('indexed_at', models.DateTimeField(auto_now=True, verbose_name='索引时间')),
+            ],
+            options={
+                'verbose_name': '搜索文档',
+                'verbose_name_plural': '搜索文档',
+            },
+        ),
+        migrations.CreateModel(
+            name='SearchPosting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=50, verbose_name='词项')),
+                ('frequency', models.PositiveIntegerField(default=0, verbose_name='词频')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_postings', to='blog.post', verbose_name='文章')),
+            ],
+            options={
+                'verbose_name': '倒排索引',
+                'verbose_name_plural': '倒排索引',
+                'unique_together': {('term', 'post')},
+            },
+        ),
+    ]
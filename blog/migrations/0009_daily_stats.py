@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-18 02:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0008_post_comment_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True, verbose_name='日期')),
+                ('posts_published', models.PositiveIntegerField(default=0, verbose_name='发布文章数')),
+                ('comments', models.PositiveIntegerField(default=0, verbose_name='评论数')),
+                ('new_users', models.PositiveIntegerField(default=0, verbose_name='新用户数')),
+                ('likes', models.PositiveIntegerField(default=0, verbose_name='点赞数')),
+                ('favorites', models.PositiveIntegerField(default=0, verbose_name='收藏数')),
+                ('views', models.PositiveIntegerField(default=0, verbose_name='浏览数')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+            ],
+            options={
+                'verbose_name': '每日统计',
+                'verbose_name_plural': '每日统计',
+                'ordering': ['-date'],
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.30 on 2026-10-18 02:49
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0009_daily_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('avatar', '头像'), ('cover', '文章封面')], max_length=10, verbose_name='类型')),
+                ('status', models.CharField(choices=[('pending', '等待处理'), ('processing', '处理中'), ('done', '已完成'), ('failed', '失败')], default='pending', max_length=10, verbose_name='状态')),
+                ('source', models.FileField(blank=True, upload_to='image_jobs/%Y/%m/', verbose_name='原始文件')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='尝试次数')),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now, verbose_name='可执行时间')),
+                ('locked_at', models.DateTimeField(blank=True, null=True, verbose_name='开始处理时间')),
+                ('result_url', models.URLField(blank=True, verbose_name='结果URL')),
+                ('last_error', models.TextField(blank=True, verbose_name='错误信息')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+                ('post', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='blog.post', verbose_name='文章')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='image_jobs', to=settings.AUTH_USER_MODEL, verbose_name='上传用户')),
+            ],
+            options={
+                'verbose_name': '图片处理任务',
+                'verbose_name_plural': '图片处理任务',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'run_after'], name='blog_imagejob_queue_idx')],
+            },
+        ),
+    ]
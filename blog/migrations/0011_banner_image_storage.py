@@ -0,0 +1,19 @@
+# Generated by Django 4.2.30 on 2026-10-18 02:51
+
+import blog.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0010_image_job'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='banner',
+            name='image',
+            field=models.ImageField(storage=blog.storage.get_image_storage, upload_to='banners/', verbose_name='横幅图片'),
+        ),
+    ]
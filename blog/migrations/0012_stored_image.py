@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-18 02:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0011_banner_image_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imagejob',
+            name='content_hash',
+            field=models.CharField(blank=True, max_length=32, verbose_name='原始文件哈希'),
+        ),
+        migrations.CreateModel(
+            name='StoredImage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('avatar', '头像'), ('cover', '文章封面')], max_length=10, verbose_name='类型')),
+                ('content_hash', models.CharField(max_length=32, verbose_name='原始文件哈希')),
+                ('url', models.URLField(verbose_name='URL')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+            ],
+            options={
+                'verbose_name': '图片索引',
+                'verbose_name_plural': '图片索引',
+                'unique_together': {('kind', 'content_hash')},
+            },
+        ),
+    ]
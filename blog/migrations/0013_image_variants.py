@@ -0,0 +1,49 @@
+# Generated by Django 4.2.30 on 2026-10-18 02:54
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0012_stored_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='banner',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=list, verbose_name='横幅多尺寸版本'),
+        ),
+        migrations.AddField(
+            model_name='imagejob',
+            name='banner',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='blog.banner', verbose_name='横幅'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='cover_variants',
+            field=models.JSONField(blank=True, default=list, verbose_name='封面多尺寸版本'),
+        ),
+        migrations.AddField(
+            model_name='storedimage',
+            name='variants',
+            field=models.JSONField(blank=True, default=list, verbose_name='多尺寸版本'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='avatar_variants',
+            field=models.JSONField(blank=True, default=list, verbose_name='头像多尺寸版本'),
+        ),
+        migrations.AlterField(
+            model_name='imagejob',
+            name='kind',
+            field=models.CharField(choices=[('avatar', '头像'), ('cover', '文章封面'), ('banner', '横幅')], max_length=10, verbose_name='类型'),
+        ),
+        migrations.AlterField(
+            model_name='storedimage',
+            name='kind',
+            field=models.CharField(choices=[('avatar', '头像'), ('cover', '文章封面'), ('banner', '横幅')], max_length=10, verbose_name='类型'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-18 03:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0013_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedPost',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(default=0, verbose_name='相似度')),
+                ('rank', models.PositiveSmallIntegerField(default=0, verbose_name='排序')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_entries', to='blog.post', verbose_name='文章')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_to_entries', to='blog.post', verbose_name='相关文章')),
+            ],
+            options={
+                'verbose_name': '相关文章',
+                'verbose_name_plural': '相关文章',
+                'indexes': [models.Index(fields=['post', 'rank'], name='blog_related_rank_idx')],
+                'unique_together': {('post', 'related')},
+            },
+        ),
+    ]
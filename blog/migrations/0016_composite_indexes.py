@@ -0,0 +1,49 @@
+# Generated by Django 4.2.30 on 2026-10-18 03:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0015_post_hot_score'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'is_approved', 'created_at'], name='blog_comment_post_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['created_at'], name='blog_comment_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['is_published', 'created_at'], name='blog_post_pub_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['is_published', 'is_vip_only', 'created_at'], name='blog_post_vip_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['category', 'is_published', 'created_at'], name='blog_post_cat_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['is_published', 'updated_at'], name='blog_post_pub_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['created_at'], name='blog_post_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='useraction',
+            index=models.Index(fields=['user', 'action', 'created_at'], name='blog_action_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='useraction',
+            index=models.Index(fields=['action', 'created_at'], name='blog_action_created_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-18 03:33
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def mark_complete(apps, schema_editor):
+    """当天结束之后汇总过的行视为已完成"""
+    DailyStats = apps.get_model('blog', 'DailyStats')
+    complete = [
+        pk for pk, date, updated_at in DailyStats.objects.values_list('pk', 'date', 'updated_at')
+        if timezone.localdate(updated_at) > date
+    ]
+    DailyStats.objects.filter(pk__in=complete).update(is_complete=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0016_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailystats',
+            name='is_complete',
+            field=models.BooleanField(default=False, verbose_name='已完成汇总'),
+        ),
+        migrations.RunPython(mark_complete, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.30 on 2026-10-18 03:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0017_daily_stats_is_complete'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedRefresh',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('post_id', models.PositiveIntegerField(unique=True, verbose_name='文章ID')),
+                ('expand', models.BooleanField(default=False, verbose_name='包括受影响的文章')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='登记时间')),
+            ],
+            options={
+                'verbose_name': '待刷新相关文章',
+                'verbose_name_plural': '待刷新相关文章',
+            },
+        ),
+    ]
@@ -1,14 +1,20 @@
-from django.db import models
+from django.db import models, transaction, IntegrityError
+from django.db.models import F, Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
 from django.contrib.auth.models import AbstractUser
 from django.utils import timezone
 from django.urls import reverse
 from .utils import post_image_path, avatar_image_path
+from .storage import get_image_storage
+from . import view_counter
+from .markdown_engine import rendered_digest, render_content
 
 
 class User(AbstractUser):
     """Extended User model"""
     is_admin = models.BooleanField(default=False, verbose_name='是否管理员')
     avatar = models.URLField(blank=True, null=True, verbose_name='头像URL')
+    avatar_variants = models.JSONField(default=list, blank=True, verbose_name='头像多尺寸版本')
     is_vip = models.BooleanField(default=False, verbose_name='是否VIP用户')
     vip_expire_date = models.DateTimeField(blank=True, null=True, verbose_name='VIP过期时间')
     
@@ -61,7 +67,10 @@ class Post(models.Model):
     title = models.CharField(max_length=200, verbose_name='标题')
     summary = models.TextField(max_length=500, verbose_name='摘要')
     content = models.TextField(verbose_name='内容')
+    content_html = models.TextField(blank=True, editable=False, verbose_name='渲染后的内容')
+    content_hash = models.CharField(max_length=64, blank=True, editable=False, verbose_name='内容摘要')
     cover_image = models.URLField(blank=True, null=True, verbose_name='封面图片URL')
+    cover_variants = models.JSONField(default=list, blank=True, verbose_name='封面多尺寸版本')
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, verbose_name='分类')
     tags = models.ManyToManyField(Tag, blank=True, verbose_name='标签')
     author = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name='作者')
@@ -70,6 +79,8 @@ class Post(models.Model):
     views = models.PositiveIntegerField(default=0, verbose_name='浏览数')
     likes = models.PositiveIntegerField(default=0, verbose_name='点赞数')
     favorites = models.PositiveIntegerField(default=0, verbose_name='收藏数')
+    comment_count = models.PositiveIntegerField(default=0, verbose_name='评论数')
+    hot_score = models.FloatField(default=0, editable=False, verbose_name='热度')
     
     # 状态字段
     is_published = models.BooleanField(default=True, verbose_name='是否发布')
@@ -79,21 +90,66 @@ class Post(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
     
+    # 计数字段每增加 1 对热度的贡献（热度随时间衰减，见 hot.py）
+    HOT_WEIGHTS = {
+        'views': 1,
+        'likes': 5,
+        'favorites': 8,
+        'comment_count': 10,
+    }
+    
     class Meta:
         verbose_name = '文章'
         verbose_name_plural = '文章'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['is_published', 'hot_score'], name='blog_post_hot_idx'),
+            # 首页、侧边栏最近文章、月度统计
+            models.Index(fields=['is_published', 'created_at'], name='blog_post_pub_created_idx'),
+            # 首页 VIP 筛选
+            models.Index(fields=['is_published', 'is_vip_only', 'created_at'], name='blog_post_vip_created_idx'),
+            # 分类文章列表、首页分类筛选
+            models.Index(fields=['category', 'is_published', 'created_at'], name='blog_post_cat_created_idx'),
+            # 列表页条件请求的最新修改时间
+            models.Index(fields=['is_published', 'updated_at'], name='blog_post_pub_updated_idx'),
+            # 后台文章列表
+            models.Index(fields=['created_at'], name='blog_post_created_idx'),
+        ]
     
     def __str__(self):
         return self.title
     
+    @classmethod
+    def counter_update(cls, field, delta):
+        """计数字段加减 delta 的 UPDATE 参数，同时按权重调整热度"""
+        hot_score = F('hot_score') + cls.HOT_WEIGHTS[field] * delta
+        if delta < 0:
+            hot_score = Greatest(hot_score, 0.0)
+        return {field: F(field) + delta, 'hot_score': hot_score}
+    
     def get_absolute_url(self):
         return reverse('blog:post_detail', kwargs={'pk': self.pk})
     
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'content' in update_fields:
+            if self.refresh_content_html() and update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'content_html', 'content_hash'}
+        super().save(*args, **kwargs)
+    
+    def refresh_content_html(self):
+        """正文或渲染引擎版本变化时重新渲染 content_html，返回是否重新渲染"""
+        digest = rendered_digest(self.content or '')
+        if digest == self.content_hash and self.content_html:
+            return False
+        self.content_html = render_content(self.content or '')
+        self.content_hash = digest
+        return True
+    
     def increment_views(self):
-        """增加浏览数"""
+        """增加浏览数（写入缓冲，由 view_counter 批量写回数据库）"""
+        view_counter.record_view(self.pk)
         self.views += 1
-        self.save(update_fields=['views'])
 
 
 class Comment(models.Model):
@@ -111,9 +167,26 @@ class Comment(models.Model):
         verbose_name = '评论'
         verbose_name_plural = '评论'
         ordering = ['-created_at']
+        indexes = [
+            # 文章页评论树、评论计数、条件请求的最新评论时间
+            models.Index(fields=['post', 'is_approved', 'created_at'], name='blog_comment_post_idx'),
+            # 后台最新评论、每日统计
+            models.Index(fields=['created_at'], name='blog_comment_created_idx'),
+        ]
     
     def __str__(self):
         return f'{self.user.username} - {self.post.title}'
+    
+    @classmethod
+    def approved_count_subquery(cls):
+        """按文章统计已审核评论数的子查询，用于重算 Post.comment_count"""
+        return Coalesce(Subquery(
+            cls.objects.filter(post=OuterRef('pk'), is_approved=True)
+            .order_by()
+            .values('post')
+            .annotate(total=Count('pk'))
+            .values('total')
+        ), 0)
 
 
 class UserAction(models.Model):
@@ -123,6 +196,12 @@ class UserAction(models.Model):
         ('favorite', '收藏'),
     ]
     
+    # 行为类型对应的 Post 计数字段
+    COUNTER_FIELDS = {
+        'like': 'likes',
+        'favorite': 'favorites',
+    }
+    
     user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name='用户')
     post = models.ForeignKey(Post, on_delete=models.CASCADE, verbose_name='文章')
     action = models.CharField(max_length=10, choices=ACTION_CHOICES, verbose_name='行为类型')
@@ -132,16 +211,52 @@ class UserAction(models.Model):
         verbose_name = '用户行为'
         verbose_name_plural = '用户行为'
         unique_together = ['user', 'post', 'action']
+        indexes = [
+            # 个人中心的点赞/收藏列表
+            models.Index(fields=['user', 'action', 'created_at'], name='blog_action_user_idx'),
+            # 每日统计
+            models.Index(fields=['action', 'created_at'], name='blog_action_created_idx'),
+        ]
     
     def __str__(self):
         return f'{self.user.username} {self.get_action_display()} {self.post.title}'
+    
+    @classmethod
+    def toggle(cls, user, post_id, action):
+        """
+        切换点赞/收藏状态，返回 (是否处于激活状态, 最新计数)
+        
+        先尝试删除已有记录，删不到再插入；计数用 F() 表达式原子更新，
+        不做整行 save，避免并发请求互相覆盖。
+        """
+        field = cls.COUNTER_FIELDS[action]
+        
+        with transaction.atomic():
+            deleted, _ = cls.objects.filter(user=user, post_id=post_id, action=action).delete()
+            if deleted:
+                Post.objects.filter(pk=post_id, **{f'{field}__gt': 0}).update(**Post.counter_update(field, -1))
+                active = False
+            else:
+                try:
+                    with transaction.atomic():
+                        cls.objects.create(user=user, post_id=post_id, action=action)
+                except IntegrityError:
+                    # 并发请求已经插入了同一条记录，计数已由对方更新
+                    pass
+                else:
+                    Post.objects.filter(pk=post_id).update(**Post.counter_update(field, 1))
+                active = True
+        
+        count = Post.objects.filter(pk=post_id).values_list(field, flat=True).first() or 0
+        return active, count
 
 
 class Banner(models.Model):
     """轮播图横幅"""
     title = models.CharField(max_length=200, verbose_name='横幅标题')
     subtitle = models.CharField(max_length=300, blank=True, verbose_name='副标题')
-    image = models.ImageField(upload_to='banners/', verbose_name='横幅图片')
+    image = models.ImageField(upload_to='banners/', storage=get_image_storage, verbose_name='横幅图片')
+    image_variants = models.JSONField(default=list, blank=True, verbose_name='横幅多尺寸版本')
     post = models.ForeignKey(Post, on_delete=models.CASCADE, null=True, blank=True, verbose_name='关联文章')
     external_url = models.URLField(blank=True, verbose_name='外部链接')
     is_active = models.BooleanField(default=True, verbose_name='是否启用')
@@ -163,4 +278,157 @@ class Banner(models.Model):
             return self.external_url
         elif self.post:
             return self.post.get_absolute_url()
-        return '#'
\ No newline at end of file
+        return '#'
+
+
+class SearchDocument(models.Model):
+    """全文搜索：已索引文章的文档长度（BM25 用）"""
+    post = models.OneToOneField(Post, on_delete=models.CASCADE, primary_key=True,
+                                related_name='search_document', verbose_name='文章')
+    length = models.PositiveIntegerField(default=0, verbose_name='词项总数')
+    indexed_at = models.DateTimeField(auto_now=True, verbose_name='索引时间')
+    
+    class Meta:
+        verbose_name = '搜索文档'
+        verbose_name_plural = '搜索文档'
+    
+    def __str__(self):
+        return f'{self.post_id} ({self.length})'
+
+
+class SearchPosting(models.Model):
+    """全文搜索倒排表：词项在文章中的（加权）词频"""
+    term = models.CharField(max_length=50, verbose_name='词项')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='search_postings', verbose_name='文章')
+    frequency = models.PositiveIntegerField(default=0, verbose_name='词频')
+    
+    class Meta:
+        verbose_name = '倒排索引'
+        verbose_name_plural = '倒排索引'
+        unique_together = ['term', 'post']
+    
+    def __str__(self):
+        return f'{self.term} -> {self.post_id} ({self.frequency})'
+
+
+class DailyStats(models.Model):
+    """每日统计汇总（由 rollup_stats 命令增量生成，浏览数由浏览计数缓冲写回时累加）"""
+    date = models.DateField(unique=True, verbose_name='日期')
+    posts_published = models.PositiveIntegerField(default=0, verbose_name='发布文章数')
+    comments = models.PositiveIntegerField(default=0, verbose_name='评论数')
+    new_users = models.PositiveIntegerField(default=0, verbose_name='新用户数')
+    likes = models.PositiveIntegerField(default=0, verbose_name='点赞数')
+    favorites = models.PositiveIntegerField(default=0, verbose_name='收藏数')
+    views = models.PositiveIntegerField(default=0, verbose_name='浏览数')
+    is_complete = models.BooleanField(default=False, verbose_name='已完成汇总')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+    
+    class Meta:
+        verbose_name = '每日统计'
+        verbose_name_plural = '每日统计'
+        ordering = ['-date']
+    
+    def __str__(self):
+        return str(self.date)
+    
+    @classmethod
+    def add_views(cls, count, date=None):
+        """累加某天的浏览数"""
+        date = date or timezone.localdate()
+        if not cls.objects.filter(date=date).update(views=F('views') + count):
+            try:
+                with transaction.atomic():
+                    cls.objects.create(date=date, views=count)
+            except IntegrityError:
+                cls.objects.filter(date=date).update(views=F('views') + count)
+
+
+class ImageJob(models.Model):
+    """图片处理任务（缩放并上传头像/封面，由 run_image_worker 命令在请求之外执行）"""
+    KIND_CHOICES = (
+        ('avatar', '头像'),
+        ('cover', '文章封面'),
+        ('banner', '横幅'),
+    )
+    STATUS_CHOICES = (
+        ('pending', '等待处理'),
+        ('processing', '处理中'),
+        ('done', '已完成'),
+        ('failed', '失败'),
+    )
+    
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES, verbose_name='类型')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending', verbose_name='状态')
+    source = models.FileField(upload_to='image_jobs/%Y/%m/', blank=True, verbose_name='原始文件')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='image_jobs', verbose_name='上传用户')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, null=True, blank=True, verbose_name='文章')
+    banner = models.ForeignKey(Banner, on_delete=models.CASCADE, null=True, blank=True, verbose_name='横幅')
+    content_hash = models.CharField(max_length=32, blank=True, verbose_name='原始文件哈希')
+    attempts = models.PositiveIntegerField(default=0, verbose_name='尝试次数')
+    run_after = models.DateTimeField(default=timezone.now, verbose_name='可执行时间')
+    locked_at = models.DateTimeField(null=True, blank=True, verbose_name='开始处理时间')
+    result_url = models.URLField(blank=True, verbose_name='结果URL')
+    last_error = models.TextField(blank=True, verbose_name='错误信息')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+    
+    class Meta:
+        verbose_name = '图片处理任务'
+        verbose_name_plural = '图片处理任务'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='blog_imagejob_queue_idx'),
+        ]
+    
+    def __str__(self):
+        return f'{self.get_kind_display()} #{self.pk} ({self.get_status_display()})'
+
+
+class StoredImage(models.Model):
+    """已处理并上传的图片索引：按原始文件的内容哈希去重，相同图片直接复用已有URL"""
+    kind = models.CharField(max_length=10, choices=ImageJob.KIND_CHOICES, verbose_name='类型')
+    content_hash = models.CharField(max_length=32, verbose_name='原始文件哈希')
+    url = models.URLField(verbose_name='URL')
+    variants = models.JSONField(default=list, blank=True, verbose_name='多尺寸版本')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+    
+    class Meta:
+        verbose_name = '图片索引'
+        verbose_name_plural = '图片索引'
+        unique_together = ['kind', 'content_hash']
+    
+    def __str__(self):
+        return f'{self.get_kind_display()} {self.content_hash}'
+
+
+class RelatedPost(models.Model):
+    """预先计算的相关文章（按标签相似度，由 rebuild_related_posts 和 refresh_related_posts 命令维护）"""
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='related_entries', verbose_name='文章')
+    related = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='related_to_entries', verbose_name='相关文章')
+    score = models.FloatField(default=0, verbose_name='相似度')
+    rank = models.PositiveSmallIntegerField(default=0, verbose_name='排序')
+    
+    class Meta:
+        verbose_name = '相关文章'
+        verbose_name_plural = '相关文章'
+        unique_together = ['post', 'related']
+        indexes = [
+            models.Index(fields=['post', 'rank'], name='blog_related_rank_idx'),
+        ]
+    
+    def __str__(self):
+        return f'{self.post_id} -> {self.related_id} ({self.score:.3f})'
+
+
+class RelatedRefresh(models.Model):
+    """待刷新相关文章的文章（由 signals 在事务提交后登记，refresh_related_posts 命令在请求之外处理）"""
+    post_id = models.PositiveIntegerField(unique=True, verbose_name='文章ID')
+    expand = models.BooleanField(default=False, verbose_name='包括受影响的文章')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='登记时间')
+    
+    class Meta:
+        verbose_name = '待刷新相关文章'
+        verbose_name_plural = '待刷新相关文章'
+    
+    def __str__(self):
+        return f'{self.post_id}{" (含受影响的文章)" if self.expand else ""}'
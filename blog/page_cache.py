@@ -0,0 +1,121 @@
+"""
+匿名访问整页缓存
+
+首页、文章详情、分类、标签页的大部分访问来自未登录用户，
+对这些请求按路径和视图读取的查询参数缓存渲染好的 HTML，命中时不再查询数据库和渲染模板。
+
+- 已登录用户的请求不读也不写缓存（导航栏等内容因人而异）
+- 带有视图不读取的查询参数（如 utm_*）的请求不使用缓存
+- 点赞/收藏状态等个人数据由前端通过 user_state 接口单独加载，缓存的 HTML 可以共用
+- 文章、分类、标签、横幅、评论变化时由 signals 递增缓存版本号，旧页面随即全部失效
+- 带有 no-cache / private 等响应头、设置了 Cookie 或用到 CSRF 令牌的响应不缓存
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.http import urlencode
+
+
+PAGE_CACHE_VERSION_KEY = 'blog:page:version'
+PAGES_CHANGED_AT_KEY = 'blog:page:changed_at'
+
+# 出现这些 Cache-Control 指令的响应不缓存
+UNCACHEABLE_DIRECTIVES = ('private', 'no-cache', 'no-store', 'max-age=0')
+
+
+def page_version():
+    """当前缓存版本号"""
+    version = cache.get(PAGE_CACHE_VERSION_KEY)
+    if version is None:
+        cache.add(PAGE_CACHE_VERSION_KEY, 1, timeout=None)
+        version = cache.get(PAGE_CACHE_VERSION_KEY, 1)
+    return version
+
+
+def pages_changed_at():
+    """
+    页面内容（侧边栏、横幅等）最近一次变化的时间戳，用于条件请求
+
+    记录随页面缓存一起过期；缓存中没有记录时按当前时间算，只会多返回一次完整页面。
+    """
+    changed_at = cache.get(PAGES_CHANGED_AT_KEY)
+    if changed_at is None:
+        cache.add(PAGES_CHANGED_AT_KEY, int(time.time()), getattr(settings, 'PAGE_CACHE_TIMEOUT', 300))
+        changed_at = cache.get(PAGES_CHANGED_AT_KEY, int(time.time()))
+    return changed_at
+
+
+def invalidate_pages():
+    """递增版本号，使所有已缓存的页面失效"""
+    try:
+        cache.incr(PAGE_CACHE_VERSION_KEY)
+    except ValueError:
+        cache.set(PAGE_CACHE_VERSION_KEY, 1, timeout=None)
+    cache.set(PAGES_CHANGED_AT_KEY, int(time.time()), getattr(settings, 'PAGE_CACHE_TIMEOUT', 300))
+
+
+def page_cache_key(request, params=()):
+    """
+    按路径和视图读取的查询参数计算缓存键，参数顺序不影响结果；
+    带有其他查询参数时返回 None（分页链接会原样带上这些参数，页面不能共用，也避免任意参数撑满缓存）
+    """
+    if not set(request.GET).issubset(params):
+        return None
+    query = urlencode([(name, request.GET.getlist(name)) for name in sorted(request.GET)], doseq=True)
+    path_hash = hashlib.md5(f'{request.path}?{query}'.encode()).hexdigest()
+    return f'blog:page:{page_version()}:{path_hash}'
+
+
+def _is_cacheable(request, response):
+    if response.status_code != 200 or response.streaming or response.cookies:
+        return False
+    # 模板中用到了 CSRF 令牌，页面与访客的 Cookie 绑定
+    if request.META.get('CSRF_COOKIE_NEEDS_UPDATE'):
+        return False
+    cache_control = response.get('Cache-Control', '')
+    return not any(directive in cache_control for directive in UNCACHEABLE_DIRECTIVES)
+
+
+def cache_anonymous_page(params=(), on_hit=None):
+    """
+    视图装饰器：缓存匿名用户的 GET 请求
+
+    params 是视图读取的查询参数，带有其他参数的请求不使用缓存；
+    on_hit(request, *args, **kwargs) 在命中缓存时调用，用于记录浏览数这类仍需执行的副作用。
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or request.user.is_authenticated:
+                return view(request, *args, **kwargs)
+
+            key = page_cache_key(request, params)
+            if key is None:
+                return view(request, *args, **kwargs)
+            cached = cache.get(key)
+            if cached is not None:
+                if on_hit:
+                    on_hit(request, *args, **kwargs)
+                content, content_type = cached
+                response = HttpResponse(content, content_type=content_type)
+                patch_vary_headers(response, ['Cookie'])
+                return response
+
+            response = view(request, *args, **kwargs)
+            if _is_cacheable(request, response):
+                if hasattr(response, 'render') and callable(response.render):
+                    response.render()
+                cache.set(
+                    key,
+                    (response.content, response['Content-Type']),
+                    getattr(settings, 'PAGE_CACHE_TIMEOUT', 300),
+                )
+            patch_vary_headers(response, ['Cookie'])
+            return response
+        return wrapper
+    return decorator
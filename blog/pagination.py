@@ -0,0 +1,123 @@
+"""
+游标（keyset）分页
+
+按 (created_at, id) 倒序翻页，翻页条件是 "比上一页最后一条更早"，
+不需要 COUNT(*)，也没有越翻越慢的 OFFSET 扫描。
+URL 中的游标是不透明的 base64 字符串，无效游标按第一页处理。
+"""
+import base64
+import binascii
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+CURSOR_PARAM = 'cursor'
+
+
+def encode_cursor(direction, post):
+    payload = json.dumps({'d': direction, 'c': post.created_at.isoformat(), 'i': post.pk})
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """解析游标，返回 (方向, created_at, id)；无效时返回 None"""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        direction = payload['d']
+        created_at = parse_datetime(payload['c'])
+        pk = int(payload['i'])
+    except (ValueError, KeyError, TypeError, binascii.Error):
+        return None
+    if direction not in ('next', 'prev') or created_at is None:
+        return None
+    return direction, created_at, pk
+
+
+class KeysetPage:
+    """一页结果，接口尽量与 django.core.paginator.Page 保持一致"""
+
+    def __init__(self, object_list, has_next, has_previous, query_params):
+        self.object_list = object_list
+        self._has_next = has_next
+        self._has_previous = has_previous
+        self._query_params = query_params
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    def _url(self, cursor):
+        params = self._query_params.copy()
+        params.pop(CURSOR_PARAM, None)
+        params.pop('page', None)
+        if cursor:
+            params[CURSOR_PARAM] = cursor
+        query = params.urlencode()
+        return f'?{query}' if query else '?'
+
+    @property
+    def first_url(self):
+        return self._url(None)
+
+    @property
+    def next_url(self):
+        if not self._has_next:
+            return None
+        return self._url(encode_cursor('next', self.object_list[-1]))
+
+    @property
+    def previous_url(self):
+        if not self._has_previous:
+            return None
+        return self._url(encode_cursor('prev', self.object_list[0]))
+
+
+class KeysetPaginator:
+    """按 (created_at, id) 倒序的游标分页器"""
+
+    def __init__(self, queryset, per_page):
+        self.queryset = queryset
+        self.per_page = per_page
+
+    def get_page(self, request):
+        query_params = request.GET.copy()
+        cursor = decode_cursor(request.GET.get(CURSOR_PARAM))
+
+        if cursor is None:
+            rows = list(self.queryset.order_by('-created_at', '-pk')[:self.per_page + 1])
+            return KeysetPage(rows[:self.per_page], len(rows) > self.per_page, False, query_params)
+
+        direction, created_at, pk = cursor
+        if direction == 'next':
+            older = Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk)
+            rows = list(self.queryset.filter(older).order_by('-created_at', '-pk')[:self.per_page + 1])
+            return KeysetPage(rows[:self.per_page], len(rows) > self.per_page, True, query_params)
+
+        newer = Q(created_at__gt=created_at) | Q(created_at=created_at, pk__gt=pk)
+        rows = list(self.queryset.filter(newer).order_by('created_at', 'pk')[:self.per_page + 1])
+        if len(rows) <= self.per_page:
+            # 已经回到开头，直接给完整的第一页
+            rows = list(self.queryset.order_by('-created_at', '-pk')[:self.per_page + 1])
+            return KeysetPage(rows[:self.per_page], len(rows) > self.per_page, False, query_params)
+        rows = rows[:self.per_page]
+        rows.reverse()
+        return KeysetPage(rows, True, True, query_params)
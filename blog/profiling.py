@@ -0,0 +1,199 @@
+"""
+按需性能分析
+
+管理员在任意页面的 URL 上加 ?_profile=1（或请求头 X-Profile: 1），该请求会在 cProfile 下执行，
+结果按请求ID保存到 PROFILE_DIR，响应头 X-Profile-Id 返回请求ID。
+后台“性能分析”页面列出已保存的结果，可以下载 .pstats 文件（python -m pstats、snakeviz 等工具打开）
+或折叠栈格式文本（flamegraph.pl、speedscope 可直接生成火焰图）。
+
+- 普通请求只多一次查询参数/请求头判断
+- 非管理员带参数访问时忽略参数，正常处理请求
+- 只保留最近 PROFILE_MAX_COUNT 份结果
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import sys
+import time
+import uuid
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils import timezone
+
+
+PROFILE_PARAM = '_profile'
+PROFILE_HEADER = 'X-Profile'
+
+PROFILE_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+
+# 折叠栈的计数单位：微秒；最大栈深度
+COLLAPSED_UNIT = 1_000_000
+MAX_STACK_DEPTH = 200
+
+
+def profile_dir():
+    """结果目录；未配置或配置为空时使用项目目录下的 profiles"""
+    return str(getattr(settings, 'PROFILE_DIR', '') or os.path.join(settings.BASE_DIR, 'profiles'))
+
+
+def profile_path(profile_id, ext):
+    """结果文件路径；profile_id 不合法时返回 None"""
+    if not PROFILE_ID_RE.match(profile_id):
+        return None
+    return os.path.join(profile_dir(), f'{profile_id}.{ext}')
+
+
+def _wanted(request):
+    if PROFILE_PARAM not in request.GET and not request.headers.get(PROFILE_HEADER):
+        return False
+    user = request.user
+    return user.is_authenticated and (user.is_admin or user.is_superuser)
+
+
+def _save(profiler, request, response, duration):
+    os.makedirs(profile_dir(), exist_ok=True)
+    profile_id = uuid.uuid4().hex
+    profiler.dump_stats(profile_path(profile_id, 'pstats'))
+
+    match = getattr(request, 'resolver_match', None)
+    meta = {
+        'id': profile_id,
+        'method': request.method,
+        'path': request.get_full_path(),
+        'view': match.view_name if match else '',
+        'status': response.status_code,
+        'duration_ms': round(duration * 1000, 1),
+        'user': request.user.get_username(),
+        'created_at': timezone.now().isoformat(),
+    }
+    with open(profile_path(profile_id, 'json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+
+    _prune()
+    return profile_id
+
+
+def _prune():
+    """删除超出保留数量的旧结果"""
+    keep = getattr(settings, 'PROFILE_MAX_COUNT', 50)
+    for meta in list_profiles()[keep:]:
+        for ext in ('json', 'pstats'):
+            try:
+                os.remove(profile_path(meta['id'], ext))
+            except FileNotFoundError:
+                pass
+
+
+def list_profiles():
+    """已保存的结果，最新的在前"""
+    directory = profile_dir()
+    if not os.path.isdir(directory):
+        return []
+
+    profiles = []
+    for name in os.listdir(directory):
+        if not name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(directory, name), encoding='utf-8') as f:
+                profiles.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    profiles.sort(key=lambda meta: meta.get('created_at', ''), reverse=True)
+    return profiles
+
+
+def _label(func):
+    filename, line, name = func
+    if filename == '~':
+        # 内置函数，例如 <built-in method time.sleep>
+        return name.strip('<>')
+    return f'{name} ({os.path.basename(filename)}:{line})'
+
+
+def collapsed_stacks(path):
+    """
+    把 .pstats 转换为折叠栈文本（每行 "调用栈;以;分号分隔 微秒数"）
+
+    cProfile 只记录调用者→被调用者的边，这里从入口函数开始沿边展开，
+    按每条边的累计时间占比分配时间，得到的是近似的调用栈。
+    """
+    stats = pstats.Stats(path).stats
+
+    callees = {}
+    for func, (_, _, _, _, callers) in stats.items():
+        for caller, (_, _, _, cumulative) in callers.items():
+            callees.setdefault(caller, []).append((func, cumulative))
+
+    lines = []
+
+    def walk(func, stack, allotted):
+        total = stats[func][3] or allotted or 1
+        children = []
+        for child, cumulative in callees.get(func, ()):
+            if child in stack:
+                continue
+            children.append((child, cumulative * allotted / total))
+
+        # 子调用的时间之和不超过本节点
+        child_sum = sum(share for _, share in children)
+        if child_sum > allotted:
+            children = [(child, share * allotted / child_sum) for child, share in children]
+            child_sum = allotted
+
+        labels = stack + (func,)
+        self_time = allotted - child_sum
+        if self_time * COLLAPSED_UNIT >= 1:
+            lines.append(f"{';'.join(_label(item) for item in labels)} {int(self_time * COLLAPSED_UNIT)}")
+
+        if len(labels) < MAX_STACK_DEPTH:
+            for child, share in children:
+                if share * COLLAPSED_UNIT >= 1:
+                    walk(child, labels, share)
+
+    roots = [func for func, (_, _, _, _, callers) in stats.items() if not callers]
+    for root in roots:
+        walk(root, (), stats[root][3])
+    return '\n'.join(lines) + '\n'
+
+
+def stats_text(path, limit=40):
+    """按累计时间排序的文本报告（后台页面预览用）"""
+    stream = io.StringIO()
+    pstats.Stats(path, stream=stream).sort_stats('cumulative').print_stats(limit)
+    return stream.getvalue()
+
+
+def _profiled_request(get_response, request):
+    """分析的入口：启用分析器之后才调用，是折叠栈中唯一完整的根"""
+    return get_response(request)
+
+
+class ProfilerMiddleware:
+    """管理员带 ?_profile=1 或 X-Profile 请求头时，在 cProfile 下执行该请求"""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PROFILER_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        # 已有其他分析器（例如调试器）时不再启动
+        if not _wanted(request) or sys.getprofile() is not None:
+            return self.get_response(request)
+
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            response = _profiled_request(self.get_response, request)
+        finally:
+            profiler.disable()
+        duration = time.perf_counter() - start
+
+        response['X-Profile-Id'] = _save(profiler, request, response, duration)
+        return response
@@ -0,0 +1,309 @@
+"""
+相关文章
+
+按标签相似度预先计算每篇文章的相关文章，存放在 RelatedPost 表中，文章页按 (post, rank) 索引一次读出。
+
+- 已发布文章的 文章×标签 关系构成一个稀疏矩阵，通过 标签→文章 的倒排表只累加有共同标签的文章对
+- 标签按 IDF 加权（越常见的标签权重越低），相似度为加权 Jaccard：共同标签权重 / 全部标签权重
+- 同分类的文章额外加分；共同标签不足时用同分类的最新文章补足
+- 文章标签、分类或发布状态变化时由 signals 在事务提交后登记，refresh_related_posts 命令在请求之外
+  增量刷新受影响的文章，只载入这些文章的标签所在的列；rebuild_related_posts 命令可全量重建
+"""
+import heapq
+import math
+import threading
+from collections import defaultdict
+
+from django.db import connection, transaction
+from django.db.models import Count
+
+from .models import Post, RelatedPost, RelatedRefresh
+
+
+# 每篇文章保存的相关文章数
+RELATED_LIMIT = 4
+
+# 同分类加分
+CATEGORY_BONUS = 0.1
+
+# 参与计算的文章字段，保存时只有这些字段变化才需要刷新
+RELATED_FIELDS = {'category', 'is_published'}
+
+
+def _idf(total, counts):
+    """标签权重：越常见的标签权重越低"""
+    return {tag_id: math.log(1 + total / count) for tag_id, count in counts.items()}
+
+
+def _category_recent(category_id):
+    """分类中最新的几篇已发布文章（多取一篇，排除文章自身后仍然够数）"""
+    return list(
+        Post.objects.filter(category_id=category_id, is_published=True)
+        .order_by('-pk')
+        .values_list('pk', flat=True)[:RELATED_LIMIT + 1]
+    )
+
+
+class TagMatrix:
+    """
+    已发布文章的 文章×标签 稀疏矩阵（按行和按列各存一份）
+
+    不指定 post_ids 时载入全部文章（全量重建用）；指定时只载入计算这些文章所需的部分：
+    它们的标签所在的列、这些列中文章的行、相关标签的文章数和所在分类最新的几篇文章
+    """
+
+    def __init__(self, post_ids=None):
+        self.post_tags = defaultdict(set)
+        self.tag_posts = defaultdict(list)
+        self.category_recent = defaultdict(list)
+        if post_ids is None:
+            self._load_all()
+        else:
+            self._load_partial(set(post_ids))
+
+        self.norms = {
+            post_id: sum(self.weights[tag_id] for tag_id in tags)
+            for post_id, tags in self.post_tags.items()
+        }
+
+    def _load_all(self):
+        posts = Post.objects.filter(is_published=True).values_list('pk', 'category_id')
+        self.categories = dict(posts)
+
+        rows = (
+            Post.tags.through.objects.filter(post__is_published=True)
+            .values_list('post_id', 'tag_id')
+            .order_by()
+        )
+        for post_id, tag_id in rows:
+            self.post_tags[post_id].add(tag_id)
+            self.tag_posts[tag_id].append(post_id)
+
+        self.weights = _idf(len(self.categories), {
+            tag_id: len(post_ids) for tag_id, post_ids in self.tag_posts.items()
+        })
+
+        # 各分类最新的文章，用于补足（多取一篇，排除文章自身后仍然够数）
+        for post_id in sorted(self.categories, reverse=True):
+            category_id = self.categories[post_id]
+            if category_id is not None and len(self.category_recent[category_id]) <= RELATED_LIMIT:
+                self.category_recent[category_id].append(post_id)
+
+    def _load_partial(self, post_ids):
+        through = Post.tags.through.objects.order_by()
+        published = through.filter(post__is_published=True)
+
+        # 这些文章的标签所在的列（只有这些列是完整的）
+        tag_ids = set(through.filter(post_id__in=post_ids).values_list('tag_id', flat=True))
+        candidates = set(post_ids)
+        for post_id, tag_id in published.filter(tag_id__in=tag_ids).values_list('post_id', 'tag_id'):
+            self.tag_posts[tag_id].append(post_id)
+            candidates.add(post_id)
+
+        self.categories = dict(
+            Post.objects.filter(pk__in=candidates, is_published=True).values_list('pk', 'category_id')
+        )
+
+        # 候选文章的完整标签行，用于计算范数
+        for post_id, tag_id in published.filter(post_id__in=self.categories).values_list('post_id', 'tag_id'):
+            self.post_tags[post_id].add(tag_id)
+
+        all_tag_ids = set().union(*self.post_tags.values()) if self.post_tags else set()
+        counts = (
+            published.filter(tag_id__in=all_tag_ids)
+            .values('tag_id')
+            .annotate(count=Count('post_id'))
+            .values_list('tag_id', 'count')
+        )
+        self.weights = _idf(Post.objects.filter(is_published=True).count(), dict(counts))
+
+        category_ids = {self.categories[post_id] for post_id in post_ids if post_id in self.categories}
+        category_ids.discard(None)
+        for category_id in category_ids:
+            recent = _category_recent(category_id)
+            self.category_recent[category_id] = recent
+            for post_id in recent:
+                self.categories.setdefault(post_id, category_id)
+
+    def similar(self, post_id, limit=RELATED_LIMIT):
+        """返回 [(相关文章ID, 相似度), ...]，按相似度从高到低排列"""
+        if post_id not in self.categories:
+            return []
+
+        # 稀疏矩阵的一行与其余行的内积：只遍历该文章标签所在的列
+        shared = defaultdict(float)
+        for tag_id in self.post_tags.get(post_id, ()):
+            weight = self.weights[tag_id]
+            for other in self.tag_posts[tag_id]:
+                if other != post_id:
+                    shared[other] += weight
+
+        norm = self.norms.get(post_id, 0)
+        scores = {
+            other: overlap / (norm + self.norms[other] - overlap)
+            for other, overlap in shared.items()
+        }
+
+        category_id = self.categories[post_id]
+        if category_id is not None:
+            for other in self.category_recent[category_id]:
+                if other != post_id:
+                    scores.setdefault(other, 0.0)
+            for other in scores:
+                if self.categories[other] == category_id:
+                    scores[other] += CATEGORY_BONUS
+
+        # 相似度相同时较新的文章在前
+        return heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], item[0]))
+
+
+def _save(matrix, post_ids):
+    entries = []
+    for post_id in post_ids:
+        entries.extend(
+            RelatedPost(post_id=post_id, related_id=related_id, score=score, rank=rank)
+            for rank, (related_id, score) in enumerate(matrix.similar(post_id))
+        )
+    with transaction.atomic():
+        RelatedPost.objects.filter(post_id__in=post_ids).delete()
+        RelatedPost.objects.bulk_create(entries, batch_size=1000)
+
+
+def refresh_posts(post_ids, matrix=None, batch_size=200):
+    """重新计算指定文章的相关文章，返回处理的文章数"""
+    post_ids = sorted(post_ids)
+    for start in range(0, len(post_ids), batch_size):
+        batch = post_ids[start:start + batch_size]
+        _save(matrix or TagMatrix(batch), batch)
+    return len(post_ids)
+
+
+def affected_posts(post_id):
+    """
+    相关文章可能受该文章影响的文章：该文章自身、有共同标签的文章、原先把它列为相关文章的文章；
+    该文章是分类中最新的几篇之一时，还包括同分类中靠分类补足（相似度不超过分类加分）或不满数的文章
+    """
+    affected = {post_id}
+    affected.update(referrers(post_id))
+
+    tag_ids = Post.tags.through.objects.filter(post_id=post_id).values_list('tag_id', flat=True)
+    affected.update(
+        Post.tags.through.objects.filter(tag_id__in=list(tag_ids), post__is_published=True)
+        .values_list('post_id', flat=True)
+    )
+
+    category_id = Post.objects.filter(pk=post_id, is_published=True).values_list('category_id', flat=True).first()
+    if category_id is not None and post_id in _category_recent(category_id):
+        in_category = Post.objects.filter(category_id=category_id, is_published=True)
+        affected.update(
+            RelatedPost.objects.filter(post__in=in_category, score__lte=CATEGORY_BONUS)
+            .values_list('post_id', flat=True)
+        )
+        affected.update(
+            in_category.annotate(related_count=Count('related_entries'))
+            .filter(related_count__lt=RELATED_LIMIT)
+            .values_list('pk', flat=True)
+        )
+    return affected
+
+
+def refresh_related(post_id):
+    """
+    增量刷新一篇文章及受其影响的文章的相关文章，返回刷新的文章数
+    """
+    return refresh_posts(affected_posts(post_id))
+
+
+def referrers(post_id):
+    """把该文章列为相关文章的文章"""
+    return set(RelatedPost.objects.filter(related_id=post_id).values_list('post_id', flat=True))
+
+
+_pending = threading.local()
+
+
+def schedule_refresh(post_ids=(), changed_ids=()):
+    """
+    在当前事务提交后登记待刷新的文章：post_ids 只重新计算它们自身，changed_ids 还包括受其影响的文章。
+    同一事务中的多次调用（如后台保存文章后再保存标签）合并为一次登记，由 refresh_related_posts 命令处理
+    """
+    if not hasattr(_pending, 'post_ids'):
+        _pending.post_ids = set()
+        _pending.changed_ids = set()
+    _pending.post_ids.update(post_ids)
+    _pending.changed_ids.update(changed_ids)
+    # 每次调用都登记回调（事务回滚时回调被丢弃），第一个执行的回调登记全部待刷新文章
+    transaction.on_commit(_enqueue_pending)
+
+
+def _enqueue_pending():
+    post_ids, changed_ids = _pending.post_ids, _pending.changed_ids
+    if not post_ids and not changed_ids:
+        return
+    _pending.post_ids, _pending.changed_ids = set(), set()
+
+    # MySQL 的 ON DUPLICATE KEY UPDATE 不能指定冲突字段，按唯一键 post_id 自动判断
+    unique_fields = ['post_id'] if connection.features.supports_update_conflicts_with_target else None
+    RelatedRefresh.objects.bulk_create(
+        [RelatedRefresh(post_id=post_id, expand=True) for post_id in changed_ids],
+        update_conflicts=True,
+        unique_fields=unique_fields,
+        update_fields=['expand'],
+    )
+    RelatedRefresh.objects.bulk_create(
+        [RelatedRefresh(post_id=post_id) for post_id in post_ids - changed_ids],
+        ignore_conflicts=True,
+    )
+
+
+def refresh_pending(batch_size=200):
+    """
+    处理一批待刷新的文章，返回刷新的文章数，没有待刷新的文章时返回 None
+
+    领取、刷新和删除登记在同一事务中完成，失败时登记保留；处理期间新的登记在事务提交后再次写入
+    """
+    with transaction.atomic():
+        entries = list(
+            RelatedRefresh.objects.select_for_update(skip_locked=True)
+            .order_by('pk')[:batch_size]
+        )
+        if not entries:
+            return None
+
+        affected = set()
+        for entry in entries:
+            if entry.expand:
+                affected.update(affected_posts(entry.post_id))
+            else:
+                affected.add(entry.post_id)
+        RelatedRefresh.objects.filter(pk__in=[entry.pk for entry in entries]).delete()
+        return refresh_posts(affected)
+
+
+def rebuild_related(batch_size=200, stdout=None):
+    """
+    全量重建相关文章，返回处理的文章数
+    """
+    # 重建开始前登记的待刷新文章由本次重建覆盖
+    queued = RelatedRefresh.objects.order_by('-pk').values_list('pk', flat=True).first()
+    matrix = TagMatrix()
+    post_ids = sorted(matrix.categories)
+
+    # 未发布文章的记录
+    RelatedPost.objects.filter(post__is_published=False).delete()
+    for start in range(0, len(post_ids), batch_size):
+        _save(matrix, post_ids[start:start + batch_size])
+        if stdout:
+            stdout.write(f'已处理 {min(start + batch_size, len(post_ids))} 篇')
+    if queued is not None:
+        RelatedRefresh.objects.filter(pk__lte=queued).delete()
+    return len(post_ids)
+
+
+def related_posts(post):
+    """文章页显示的相关文章（包含VIP文章，用于显示标识）"""
+    return (
+        Post.objects.filter(related_to_entries__post=post, is_published=True)
+        .order_by('related_to_entries__rank')
+        .defer('content', 'content_html')
+    )
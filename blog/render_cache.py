@@ -0,0 +1,109 @@
+"""
+渲染结果缓存
+
+markdown / is_markdown 过滤器的结果只取决于输入文本，按内容摘要缓存：
+先查进程内的 LRU，未命中再查共享缓存（只缓存较长的文本，短文本直接渲染更快），
+都未命中才真正渲染。命中/未命中次数可通过 stats() 查看。
+
+进程内 LRU 按结果占用的内存总量（字节）限制大小，超过上限的 1/16 的单个结果不放入 LRU，
+避免几篇长文挤掉其余全部条目。
+"""
+import sys
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .markdown_engine import ENGINE_VERSION, content_digest
+
+
+class RenderCache:
+    """按内容摘要缓存某个纯函数的结果"""
+
+    def __init__(self, name, func, max_bytes=8 * 1024 * 1024):
+        self.name = name
+        self.func = func
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.local_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    def _shared_key(self, digest):
+        return f'blog:render:{self.name}:v{ENGINE_VERSION}:{digest}'
+
+    def __call__(self, text):
+        digest = content_digest(text)
+
+        with self._lock:
+            if digest in self._entries:
+                self._entries.move_to_end(digest)
+                self.local_hits += 1
+                return self._entries[digest][0]
+
+        use_shared = len(text) >= getattr(settings, 'RENDER_CACHE_SHARED_MIN_SIZE', 2048)
+        value = cache.get(self._shared_key(digest)) if use_shared else None
+
+        if value is not None:
+            with self._lock:
+                self.shared_hits += 1
+        else:
+            value = self.func(text)
+            with self._lock:
+                self.misses += 1
+            if use_shared:
+                cache.set(self._shared_key(digest), value, getattr(settings, 'RENDER_CACHE_TIMEOUT', 86400))
+
+        size = sys.getsizeof(digest) + sys.getsizeof(value)
+        if size > self.max_bytes // 16:
+            return value
+
+        with self._lock:
+            old = self._entries.pop(digest, None)
+            if old is not None:
+                self.bytes -= old[1]
+            self._entries[digest] = (value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                self.bytes -= self._entries.popitem(last=False)[1][1]
+
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+            self.local_hits = self.shared_hits = self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.local_hits + self.shared_hits + self.misses
+            hits = self.local_hits + self.shared_hits
+            return {
+                'name': self.name,
+                'size': len(self._entries),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'local_hits': self.local_hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'hit_rate': hits / lookups if lookups else 0.0,
+            }
+
+
+_registry = []
+
+
+def register(name, func):
+    """创建并登记一个渲染缓存"""
+    render_cache = RenderCache(name, func, getattr(settings, 'RENDER_CACHE_MAX_BYTES', 8 * 1024 * 1024))
+    _registry.append(render_cache)
+    return render_cache
+
+
+def stats():
+    """当前进程所有渲染缓存的命中统计"""
+    return [render_cache.stats() for render_cache in _registry]
@@ -0,0 +1,247 @@
+"""
+文章全文搜索
+
+倒排索引存放在 SearchPosting / SearchDocument 两张表中：
+- 中文按相邻两字切分（bigram），英文和数字按单词切分并转为小写
+- 标题、摘要、正文分别按权重累加词频
+- 查询时要求命中全部词项，按 BM25 打分排序；单独的汉字没有 bigram，只对这些字做子串匹配
+
+文章保存/删除时由 signals 增量更新索引，rebuild_search_index 命令可全量重建。
+BM25 需要的文档总数和总长度放在缓存中，索引或移除文档时在事务提交后增减，查询时不再聚合整张文档表。
+"""
+import math
+import re
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+
+from .models import Post, SearchDocument, SearchPosting
+
+
+# 英文单词/数字，或连续的中日韩文字
+TOKEN_RE = re.compile(r'[a-z0-9]+|[\u3400-\u4dbf\u4e00-\u9fff]+')
+ASCII_RE = re.compile(r'[a-z0-9]')
+
+MAX_TERM_LENGTH = 50
+
+# 字段权重
+FIELD_WEIGHTS = (
+    ('title', 3),
+    ('summary', 2),
+    ('content', 1),
+)
+
+# BM25 参数
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+CORPUS_CACHE_KEY = 'blog:search:corpus'
+
+# 参与索引的文章字段，保存时只有这些字段变化才需要重建索引
+INDEXED_FIELDS = {'title', 'summary', 'content', 'is_published'}
+
+
+def tokenize(text):
+    """
+    把文本切分为词项列表
+    """
+    tokens = []
+    for match in TOKEN_RE.finditer(text.lower()):
+        chunk = match.group()
+        if ASCII_RE.match(chunk):
+            tokens.append(chunk[:MAX_TERM_LENGTH])
+        elif len(chunk) == 1:
+            tokens.append(chunk)
+        else:
+            tokens.extend(chunk[i:i + 2] for i in range(len(chunk) - 1))
+    return tokens
+
+
+def build_postings(post):
+    """
+    计算一篇文章的加权词频，返回 (Counter, 文档长度)
+    """
+    frequencies = Counter()
+    for field, weight in FIELD_WEIGHTS:
+        for token in tokenize(getattr(post, field) or ''):
+            frequencies[token] += weight
+    return frequencies, sum(frequencies.values())
+
+
+def corpus_stats():
+    """
+    返回 (文档总数, 平均文档长度)，优先读缓存
+    """
+    stats = cache.get(CORPUS_CACHE_KEY)
+    if stats is None:
+        stats = SearchDocument.objects.aggregate(documents=Count('pk'), length=Sum('length'))
+        stats = {'documents': stats['documents'], 'length': stats['length'] or 0}
+        cache.set(CORPUS_CACHE_KEY, stats, getattr(settings, 'SEARCH_CORPUS_CACHE_TIMEOUT', 3600))
+    return stats['documents'], (stats['length'] / stats['documents'] if stats['documents'] else 1)
+
+
+def _adjust_corpus(documents, length):
+    """文档增删后调整缓存中的统计（缓存过期后重新聚合，顺带修正并发写入造成的偏差）"""
+    def adjust():
+        stats = cache.get(CORPUS_CACHE_KEY)
+        if stats is None:
+            return
+        stats = {'documents': stats['documents'] + documents, 'length': stats['length'] + length}
+        cache.set(CORPUS_CACHE_KEY, stats, getattr(settings, 'SEARCH_CORPUS_CACHE_TIMEOUT', 3600))
+    transaction.on_commit(adjust)
+
+
+def index_post(post):
+    """
+    增量更新一篇文章的索引；未发布的文章从索引中移除
+    """
+    with transaction.atomic():
+        SearchPosting.objects.filter(post_id=post.pk).delete()
+        old_length = SearchDocument.objects.filter(post_id=post.pk).values_list('length', flat=True).first()
+
+        if not post.is_published:
+            if old_length is not None:
+                SearchDocument.objects.filter(post_id=post.pk).delete()
+                _adjust_corpus(-1, -old_length)
+            return
+
+        frequencies, length = build_postings(post)
+        SearchPosting.objects.bulk_create([
+            SearchPosting(term=term, post_id=post.pk, frequency=frequency)
+            for term, frequency in frequencies.items()
+        ])
+        SearchDocument.objects.update_or_create(post_id=post.pk, defaults={'length': length})
+        if old_length is None:
+            _adjust_corpus(1, length)
+        else:
+            _adjust_corpus(0, length - old_length)
+
+
+def unindex_post(post_id):
+    """
+    文章删除前从索引中移除
+    """
+    with transaction.atomic():
+        old_length = SearchDocument.objects.filter(post_id=post_id).values_list('length', flat=True).first()
+        if old_length is None:
+            return
+        SearchPosting.objects.filter(post_id=post_id).delete()
+        SearchDocument.objects.filter(post_id=post_id).delete()
+        _adjust_corpus(-1, -old_length)
+
+
+def search_post_ids(query):
+    """
+    搜索文章，返回按相关度排序的文章 ID 列表
+    """
+    terms = set(tokenize(query))
+
+    # 单个汉字没有对应的 bigram，只有这些字按子串匹配，其余词项仍按 BM25 排序
+    chars = {term for term in terms if len(term) == 1 and not ASCII_RE.match(term)}
+    terms -= chars
+    if not terms:
+        return _substring_search_ids(chars) if chars else []
+
+    ranked = _bm25_ids(terms)
+    if chars and ranked:
+        matched = set(
+            Post.objects.filter(_contains_all(chars), pk__in=ranked).values_list('pk', flat=True)
+        )
+        ranked = [post_id for post_id in ranked if post_id in matched]
+    return ranked
+
+
+def _bm25_ids(terms):
+    """命中全部词项的文章 ID，按 BM25 得分排序"""
+    document_frequencies = dict(
+        SearchPosting.objects.filter(term__in=terms)
+        .values_list('term')
+        .annotate(df=Count('post_id'))
+        .order_by()
+    )
+    # 要求命中全部词项
+    if len(document_frequencies) < len(terms):
+        return []
+
+    total, avg_length = corpus_stats()
+
+    # 从最稀有的词项开始收窄候选集
+    rarest = min(terms, key=document_frequencies.get)
+    candidates = SearchPosting.objects.filter(term=rarest).values('post_id')
+
+    postings = (
+        SearchPosting.objects.filter(term__in=terms, post_id__in=candidates)
+        .values_list('post_id', 'term', 'frequency', 'post__search_document__length')
+    )
+
+    scores = {}
+    matched_terms = Counter()
+    for post_id, term, frequency, length in postings:
+        df = document_frequencies[term]
+        idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * (length or 0) / avg_length)
+        scores[post_id] = scores.get(post_id, 0.0) + idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+        matched_terms[post_id] += 1
+
+    ranked = [post_id for post_id in scores if matched_terms[post_id] == len(terms)]
+    ranked.sort(key=lambda post_id: (-scores[post_id], -post_id))
+    return ranked
+
+
+def _contains_all(chars):
+    """标题、摘要或正文中包含每一个字"""
+    condition = Q()
+    for char in chars:
+        condition &= Q(title__icontains=char) | Q(summary__icontains=char) | Q(content__icontains=char)
+    return condition
+
+
+def _substring_search_ids(chars):
+    return list(
+        Post.objects.filter(_contains_all(chars), is_published=True)
+        .order_by('-created_at').values_list('pk', flat=True)
+    )
+
+
+def rebuild_index(batch_size=200, stdout=None):
+    """
+    全量重建索引，返回索引的文章数
+    """
+    SearchPosting.objects.all().delete()
+    SearchDocument.objects.all().delete()
+
+    indexed = 0
+    last_pk = 0
+    while True:
+        posts = list(
+            Post.objects.filter(is_published=True, pk__gt=last_pk)
+            .order_by('pk')
+            .only('pk', 'title', 'summary', 'content')[:batch_size]
+        )
+        if not posts:
+            break
+        last_pk = posts[-1].pk
+
+        postings = []
+        documents = []
+        for post in posts:
+            frequencies, length = build_postings(post)
+            postings.extend(
+                SearchPosting(term=term, post_id=post.pk, frequency=frequency)
+                for term, frequency in frequencies.items()
+            )
+            documents.append(SearchDocument(post_id=post.pk, length=length))
+
+        with transaction.atomic():
+            SearchPosting.objects.bulk_create(postings, batch_size=1000)
+            SearchDocument.objects.bulk_create(documents)
+
+        indexed += len(posts)
+        if stdout:
+            stdout.write(f'已索引 {indexed} 篇')
+
+    cache.delete(CORPUS_CACHE_KEY)
+    return indexed
@@ -0,0 +1,66 @@
+"""
+侧边栏数据（最近文章、分类统计、热门标签）
+
+首页和文章详情页共用同一份数据，构建一次后放入缓存，
+文章、分类、标签变化时由 signals 中的处理函数使缓存失效。
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+
+from .models import Post, Category, Tag
+from . import timing
+
+
+SIDEBAR_CACHE_KEY = 'blog:sidebar'
+
+
+def build_sidebar_data():
+    """
+    从数据库构建侧边栏数据
+    """
+    # 最近文章（包含VIP文章，用于显示标识）；只取侧边栏用到的字段，缓存中不带正文
+    recent_posts = list(
+        Post.objects.filter(is_published=True)
+        .order_by('-created_at')
+        .only('pk', 'title', 'created_at', 'views', 'likes', 'is_vip_only')[:5]
+    )
+    
+    # 分类统计
+    categories = list(Category.objects.annotate(post_count=Count('post')).filter(post_count__gt=0)[:10])
+    
+    # 各分类已发布文章数（分类页显示，每个分类一行）
+    published_counts = dict(
+        Post.objects.filter(is_published=True, category__isnull=False)
+        .values('category_id')
+        .annotate(count=Count('pk'))
+        .values_list('category_id', 'count')
+        .order_by()
+    )
+    
+    # 热门标签
+    tags = list(Tag.objects.annotate(post_count=Count('post')).filter(post_count__gt=0).order_by('-post_count')[:20])
+    
+    return {
+        'recent_posts': recent_posts,
+        'categories': categories,
+        'tags': tags,
+        'published_counts': published_counts,
+    }
+
+
+def get_sidebar_data():
+    """
+    获取侧边栏数据，优先读缓存
+    """
+    with timing.span('sidebar'):
+        data = cache.get(SIDEBAR_CACHE_KEY)
+        if data is None:
+            data = build_sidebar_data()
+            cache.set(SIDEBAR_CACHE_KEY, data, getattr(settings, 'SIDEBAR_CACHE_TIMEOUT', 600))
+    return data
+
+
+def invalidate_sidebar():
+    """使侧边栏缓存失效"""
+    cache.delete(SIDEBAR_CACHE_KEY)
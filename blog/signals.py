@@ -0,0 +1,141 @@
+"""
+模型信号处理：数据变化时使相关缓存失效
+"""
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from .models import Post, Category, Tag, Comment, User, Banner
+from .sidebar import invalidate_sidebar
+from .context_processors import invalidate_site_categories
+from . import search, related
+from .stats import invalidate_totals
+from .page_cache import invalidate_pages
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def sidebar_source_changed(sender, **kwargs):
+    """文章、分类、标签变化"""
+    invalidate_sidebar()
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def post_tags_changed(sender, instance, action, reverse, pk_set=None, **kwargs):
+    """文章标签关系变化"""
+    if action == 'pre_clear' and reverse:
+        # 从标签一侧清空时 post_clear 不带 pk_set，先记下该标签的文章
+        instance._related_post_ids = set(
+            sender.objects.filter(tag_id=instance.pk).values_list('post_id', flat=True)
+        )
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_sidebar()
+        invalidate_pages()
+        # 从标签一侧修改时 instance 是标签，pk_set 是文章
+        if not reverse:
+            post_ids = (instance.pk,)
+        elif action == 'post_clear':
+            post_ids = getattr(instance, '_related_post_ids', ())
+        else:
+            post_ids = pk_set or ()
+        related.schedule_refresh(changed_ids=post_ids)
+
+
+@receiver(pre_save, sender=Post)
+def post_related_saving(sender, instance, update_fields=None, **kwargs):
+    """与保存前的分类和发布状态比较，只修改正文、标题等字段时不刷新相关文章"""
+    if update_fields is not None and not related.RELATED_FIELDS & set(update_fields):
+        instance._related_changed = False
+        return
+    old = None
+    if instance.pk:
+        old = Post.objects.filter(pk=instance.pk).values_list('category_id', 'is_published').first()
+    instance._related_changed = old != (instance.category_id, instance.is_published)
+
+
+@receiver(post_save, sender=Post)
+def post_related_changed(sender, instance, **kwargs):
+    """文章分类或发布状态变化时刷新相关文章（标签变化由 post_tags_changed 处理）"""
+    if getattr(instance, '_related_changed', True):
+        related.schedule_refresh(changed_ids=(instance.pk,))
+
+
+@receiver(pre_delete, sender=Post)
+def post_deleting(sender, instance, **kwargs):
+    """记下把该文章列为相关文章的文章，删除后为它们重新计算；从搜索索引中移除"""
+    instance._related_referrers = related.referrers(instance.pk)
+    search.unindex_post(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    related.schedule_refresh(post_ids=getattr(instance, '_related_referrers', ()))
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Banner)
+@receiver(post_delete, sender=Banner)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def page_source_changed(sender, **kwargs):
+    """页面内容变化，匿名页面缓存失效"""
+    invalidate_pages()
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def site_categories_changed(sender, **kwargs):
+    """导航栏分类依赖文章发布状态和分类"""
+    invalidate_site_categories()
+
+
+@receiver(post_save, sender=Post)
+def update_search_index(sender, instance, update_fields=None, **kwargs):
+    """文章标题、摘要、正文或发布状态变化时更新搜索索引"""
+    if update_fields is not None and not search.INDEXED_FIELDS & set(update_fields):
+        return
+    search.index_post(instance)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    """新评论计数加一；已有评论（如审核状态变化）重算该文章的评论数"""
+    if created:
+        if instance.is_approved:
+            Post.objects.filter(pk=instance.post_id).update(**Post.counter_update('comment_count', 1))
+    else:
+        Post.objects.filter(pk=instance.post_id).update(comment_count=Comment.approved_count_subquery())
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    """删除已审核评论时计数减一"""
+    if instance.is_approved:
+        Post.objects.filter(pk=instance.post_id, comment_count__gt=0).update(**Post.counter_update('comment_count', -1))
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=Comment)
+@receiver(post_delete, sender=User)
+def stats_totals_changed(sender, **kwargs):
+    """后台汇总数变化"""
+    invalidate_totals()
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_save, sender=User)
+def stats_totals_created(sender, created, **kwargs):
+    """评论和用户只有新增时才影响汇总数（避免每次登录更新 last_login 都失效）"""
+    if created:
+        invalidate_totals()
@@ -0,0 +1,212 @@
+"""
+后台统计数据
+
+- 汇总数（文章、评论、用户）放入缓存，相关模型变化时由 signals 使其失效
+- 月度文章数：按本地时区算好每个月的起止时间，用一条按月份 GROUP BY 的查询
+  在 created_at 范围上一次取出所有月份（可选按分类分组），
+  避免逐月查询和 __year/__month 这类无法使用索引的写法
+- 每日汇总表 DailyStats：rollup_daily_stats 从上次的水位线开始增量汇总，
+  报表按天读取汇总行，不再扫描原始数据
+"""
+from collections import Counter
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Case, Count, IntegerField, Q, Value, When
+from django.utils import timezone
+
+from .models import Post, Comment, User, UserAction, DailyStats
+
+
+TOTALS_CACHE_KEY = 'blog:stats:totals'
+
+
+def get_totals():
+    """
+    文章总数、已发布文章数、评论数、用户数
+    """
+    totals = cache.get(TOTALS_CACHE_KEY)
+    if totals is None:
+        totals = Post.objects.aggregate(
+            total_posts=Count('pk'),
+            published_posts=Count('pk', filter=Q(is_published=True)),
+        )
+        totals['total_comments'] = Comment.objects.count()
+        totals['total_users'] = User.objects.count()
+        cache.set(TOTALS_CACHE_KEY, totals, getattr(settings, 'STATS_CACHE_TIMEOUT', 300))
+    return totals
+
+
+def invalidate_totals():
+    """使汇总数缓存失效"""
+    cache.delete(TOTALS_CACHE_KEY)
+
+
+def month_starts(start, end):
+    """
+    [start, end) 范围内每个月的第一天（本地时区），start / end 为 (年, 月)
+    """
+    tz = timezone.get_current_timezone()
+    year, month = start
+    months = []
+    while (year, month) < end:
+        months.append(timezone.make_aware(datetime(year, month, 1), tz))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+def _month_boundaries(start, end):
+    starts = month_starts(start, end)
+    end_year, end_month = end
+    last = timezone.make_aware(datetime(end_year, end_month, 1), timezone.get_current_timezone())
+    return starts, starts[1:] + [last]
+
+
+def monthly_post_counts(start, end, published_only=True, by_category=False):
+    """
+    统计 [start, end) 每个月的文章数，start / end 为 (年, 月)
+
+    返回 (月份列表, 数据)：
+    - by_category=False 时数据是与月份一一对应的数量列表
+    - by_category=True 时数据是 {分类ID: 数量列表}（未分类的键为 None）
+    """
+    starts, ends = _month_boundaries(start, end)
+    if not starts:
+        return [], {} if by_category else []
+
+    queryset = Post.objects.filter(created_at__gte=starts[0], created_at__lt=ends[-1])
+    if published_only:
+        queryset = queryset.filter(is_published=True)
+
+    # 按月份序号 GROUP BY。不用 TruncMonth：USE_TZ 下它在 MySQL 上依赖 CONVERT_TZ，
+    # 未导入时区表时结果为 NULL；按本地时区算好的边界用 CASE 归月，只是对已取出的行做比较
+    month = Case(
+        *[When(created_at__lt=month_end, then=Value(index)) for index, month_end in enumerate(ends)],
+        output_field=IntegerField(),
+    )
+    rows = (
+        queryset.order_by()
+        .annotate(month=month)
+        .values(*(['category_id'] if by_category else []), 'month')
+        .annotate(count=Count('pk'))
+    )
+
+    if not by_category:
+        counts = [0] * len(starts)
+        for row in rows:
+            counts[row['month']] = row['count']
+        return starts, counts
+
+    counts = {}
+    for row in rows:
+        counts.setdefault(row['category_id'], [0] * len(starts))[row['month']] = row['count']
+    return starts, counts
+
+
+def yearly_post_counts(year, **kwargs):
+    """某一年 12 个月的文章数"""
+    return monthly_post_counts((year, 1), (year + 1, 1), **kwargs)
+
+
+# 汇总字段 -> (模型, 额外过滤条件)，浏览数由浏览计数缓冲写回时累加，不在这里计算
+ROLLUP_SOURCES = {
+    'posts_published': (Post, {'is_published': True}),
+    'comments': (Comment, {}),
+    'new_users': (User, {}),
+    'likes': (UserAction, {'action': 'like'}),
+    'favorites': (UserAction, {'action': 'favorite'}),
+}
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, datetime.min.time()), timezone.get_current_timezone())
+
+
+def _count_by_day(model, filters, start, end):
+    """按本地日期统计 [start, end) 内新建的记录数"""
+    date_field = 'date_joined' if model is User else 'created_at'
+    queryset = model.objects.filter(
+        **filters,
+        **{f'{date_field}__gte': _day_start(start), f'{date_field}__lt': _day_start(end)},
+    ).values_list(date_field, flat=True)
+
+    counts = Counter()
+    for created_at in queryset.iterator(chunk_size=2000):
+        counts[timezone.localdate(created_at)] += 1
+    return counts
+
+
+def rollup_watermark():
+    """已完成汇总的最后一天（当天结束之后汇总过）；还没有汇总过时返回 None"""
+    return (
+        DailyStats.objects.filter(is_complete=True)
+        .order_by('-date')
+        .values_list('date', flat=True)
+        .first()
+    )
+
+
+def _earliest_day():
+    candidates = [
+        Post.objects.order_by('created_at').values_list('created_at', flat=True).first(),
+        Comment.objects.order_by('created_at').values_list('created_at', flat=True).first(),
+        User.objects.order_by('date_joined').values_list('date_joined', flat=True).first(),
+        UserAction.objects.order_by('created_at').values_list('created_at', flat=True).first(),
+    ]
+    candidates = [timezone.localdate(value) for value in candidates if value]
+    return min(candidates) if candidates else None
+
+
+def rollup_daily_stats(since=None):
+    """
+    汇总 [since, 今天] 的每日统计，返回处理的天数
+
+    since 为空时从水位线的下一天开始，从未汇总过则从最早的数据开始；
+    今天之前的日期汇总后标记为已完成，之后不再重算，今天每次都重算。
+    已有的行（例如浏览计数写回时创建的当天的行）按日期 upsert，浏览数保持不变。
+    """
+    today = timezone.localdate()
+    if since is None:
+        watermark = rollup_watermark()
+        since = watermark + timedelta(days=1) if watermark else _earliest_day()
+    if since is None or since > today:
+        return 0
+    end = today + timedelta(days=1)
+
+    counts = {
+        field: _count_by_day(model, filters, since, end)
+        for field, (model, filters) in ROLLUP_SOURCES.items()
+    }
+
+    rows = []
+    day = since
+    while day < end:
+        values = {field: counts[field].get(day, 0) for field in ROLLUP_SOURCES}
+        rows.append(DailyStats(date=day, is_complete=day < today, **values))
+        day += timedelta(days=1)
+
+    # MySQL 的 ON DUPLICATE KEY UPDATE 不能指定冲突字段，按唯一键 date 自动判断
+    unique_fields = ['date'] if connection.features.supports_update_conflicts_with_target else None
+    DailyStats.objects.bulk_create(
+        rows,
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=unique_fields,
+        update_fields=[*ROLLUP_SOURCES, 'is_complete', 'updated_at'],
+    )
+    return len(rows)
+
+
+def daily_stats(start, end):
+    """
+    [start, end] 每天的汇总数据，缺失的日期补零
+    """
+    rows = {row.date: row for row in DailyStats.objects.filter(date__gte=start, date__lte=end)}
+    series = []
+    day = start
+    while day <= end:
+        series.append(rows.get(day) or DailyStats(date=day))
+        day += timedelta(days=1)
+    return series
@@ -0,0 +1,160 @@
+"""
+图片存储
+
+头像、文章封面、横幅统一通过 settings.STORAGES['images'] 保存：
+- 生产环境使用 QiniuStorage 上传到七牛云
+- IMAGE_STORAGE=local 时换成保存到 MEDIA_ROOT 的 FileSystemStorage，便于离线开发、测试和基准测试
+
+QiniuStorage 在实例内复用鉴权对象和上传凭证（凭证在过期前统一续签），
+HTTP 连接由七牛 SDK 的共享 session 复用，网络错误和 5xx 响应按指数退避重试。
+"""
+import os
+import threading
+import time
+
+import requests
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import Storage, storages
+from django.utils.deconstruct import deconstructible
+from qiniu import Auth, BucketManager, put_data
+
+from . import timing
+
+
+# 上传凭证在过期前多久续签（秒）
+TOKEN_RENEW_MARGIN = 300
+
+# 七牛云状态码：文件已存在 / 文件不存在
+STATUS_FILE_EXISTS = 614
+STATUS_NOT_FOUND = 612
+
+
+class QiniuStorageError(OSError):
+    """七牛云请求失败"""
+
+
+def get_image_storage():
+    """图片存储实例（ImageField 的 storage 参数也使用它）"""
+    return storages['images']
+
+
+@deconstructible
+class QiniuStorage(Storage):
+    """七牛云对象存储"""
+
+    def __init__(self, access_key=None, secret_key=None, bucket_name=None, bucket_domain=None,
+                 location='', secure=False, token_expires=3600, max_retries=3, retry_delay=0.5):
+        self.access_key = access_key or settings.QINIU_ACCESS_KEY
+        self.secret_key = secret_key or settings.QINIU_SECRET_KEY
+        self.bucket_name = bucket_name or settings.QINIU_BUCKET_NAME
+        self.bucket_domain = bucket_domain or settings.QINIU_BUCKET_DOMAIN
+        self.location = location.strip('/')
+        self.secure = secure
+        self.token_expires = token_expires
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+
+        self._auth = None
+        self._bucket = None
+        self._token = None
+        self._token_expires_at = 0
+        self._lock = threading.Lock()
+
+    @property
+    def auth(self):
+        if self._auth is None:
+            self._auth = Auth(self.access_key, self.secret_key)
+        return self._auth
+
+    @property
+    def bucket(self):
+        if self._bucket is None:
+            self._bucket = BucketManager(self.auth)
+        return self._bucket
+
+    def _key(self, name):
+        name = name.replace('\\', '/').lstrip('/')
+        return f'{self.location}/{name}' if self.location else name
+
+    def upload_token(self):
+        """
+        整个空间的上传凭证（只允许新增，不允许覆盖），过期前复用
+        """
+        with self._lock:
+            now = time.time()
+            if self._token is None or now >= self._token_expires_at - TOKEN_RENEW_MARGIN:
+                self._token = self.auth.upload_token(self.bucket_name, expires=self.token_expires)
+                self._token_expires_at = now + self.token_expires
+            return self._token
+
+    def _is_transient(self, info):
+        return info is None or info.status_code == -1 or 500 <= info.status_code < 600
+
+    def _request(self, func, *args, **kwargs):
+        """调用七牛 SDK，遇到网络错误或 5xx 时重试"""
+        with timing.span('storage'):
+            return self._request_with_retry(func, *args, **kwargs)
+
+    def _request_with_retry(self, func, *args, **kwargs):
+        for attempt in range(self.max_retries + 1):
+            try:
+                ret, info = func(*args, **kwargs)
+            except (RuntimeError, requests.RequestException) as e:
+                # SDK 查询空间所在区域失败时直接抛出异常
+                if attempt == self.max_retries:
+                    raise QiniuStorageError(f'请求七牛云失败：{e}') from e
+            else:
+                if not self._is_transient(info) or attempt == self.max_retries:
+                    return ret, info
+            time.sleep(self.retry_delay * 2 ** attempt)
+
+    def _save(self, name, content):
+        content.seek(0)
+        data = content.read()
+        while True:
+            ret, info = self._request(put_data, self.upload_token(), self._key(name), data)
+            if info.status_code == STATUS_FILE_EXISTS:
+                # 凭证不允许覆盖，同名文件已存在时换一个名字
+                name = self.get_alternative_name(*os.path.splitext(name))
+                continue
+            if info.status_code != 200:
+                raise QiniuStorageError(f'上传到七牛云失败：{info.status_code} {info.error}')
+            return name
+
+    def get_available_name(self, name, max_length=None):
+        # 不预先查询是否存在，冲突由上传时的 614 状态码处理，省去一次请求
+        return name
+
+    def _open(self, name, mode='rb'):
+        with timing.span('storage'):
+            response = requests.get(self.url(name), timeout=30)
+        if response.status_code != 200:
+            raise FileNotFoundError(name)
+        return ContentFile(response.content, name=name)
+
+    def _stat(self, name):
+        ret, info = self._request(self.bucket.stat, self.bucket_name, self._key(name))
+        if info.status_code == STATUS_NOT_FOUND:
+            return None
+        if info.status_code != 200:
+            raise QiniuStorageError(f'查询七牛云文件失败：{info.status_code} {info.error}')
+        return ret
+
+    def exists(self, name):
+        return self._stat(name) is not None
+
+    def size(self, name):
+        ret = self._stat(name)
+        if ret is None:
+            raise FileNotFoundError(name)
+        return ret['fsize']
+
+    def delete(self, name):
+        ret, info = self._request(self.bucket.delete, self.bucket_name, self._key(name))
+        if info.status_code not in (200, STATUS_NOT_FOUND):
+            raise QiniuStorageError(f'删除七牛云文件失败：{info.status_code} {info.error}')
+
+    def url(self, name):
+        scheme = 'https' if self.secure else 'http'
+        return f'{scheme}://{self.bucket_domain}/{self._key(name)}'
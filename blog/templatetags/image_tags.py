@@ -0,0 +1,37 @@
+from django import template
+from django.forms.utils import flatatt
+from django.utils.html import format_html
+
+from ..images import CONTENT_TYPES, srcset
+
+register = template.Library()
+
+
+@register.simple_tag
+def responsive_img(src, variants=None, sizes='100vw', alt='', loading='lazy', **attrs):
+    """
+    输出响应式图片：有多尺寸版本时生成 <picture>，优先 WebP，按 sizes 选择宽度
+
+    用法：{% responsive_img post.cover_image post.cover_variants sizes="200px" alt=post.title class="post-card-img" %}
+    """
+    if not src:
+        return ''
+
+    img_attrs = {'src': src, 'alt': alt, 'loading': loading, 'decoding': 'async'}
+    img_attrs.update(attrs)
+
+    jpeg_srcset = srcset(variants, 'jpeg')
+    webp_srcset = srcset(variants, 'webp')
+    if jpeg_srcset:
+        img_attrs['srcset'] = jpeg_srcset
+        img_attrs['sizes'] = sizes
+
+    img = format_html('<img{}>', flatatt(img_attrs))
+    if not webp_srcset:
+        return img
+
+    return format_html(
+        '<picture class="responsive-picture"><source{}>{}</picture>',
+        flatatt({'type': CONTENT_TYPES['webp'], 'srcset': webp_srcset, 'sizes': sizes}),
+        img,
+    )
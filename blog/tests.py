@@ -0,0 +1,385 @@
+import io
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from . import image_jobs, related
+from .search import search_post_ids
+from .stats import monthly_post_counts
+from .markdown_engine import MAX_QUOTE_DEPTH, render
+from .page_cache import page_cache_key
+from .render_cache import RenderCache
+from .models import User, Category, Tag, Post, Comment, ImageJob, RelatedPost, RelatedRefresh
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}},
+    VIEW_COUNT_BUFFER='memory',
+    VIEW_COUNT_FLUSH_INTERVAL=3600,
+    VIEW_COUNT_FLUSH_THRESHOLD=100000,
+)
+class PostDetailQueryCountTests(TestCase):
+    """文章页的查询数与评论数量无关"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user('author', password='pw', is_admin=True)
+        cls.readers = [User.objects.create_user(f'reader{i}', password='pw') for i in range(5)]
+        category = Category.objects.create(name='分类')
+        cls.post = Post.objects.create(title='文章', content='正文', category=category, author=cls.author)
+        cls.url = reverse('blog:post_detail', args=[cls.post.pk])
+
+    def add_comments(self, count):
+        """添加 count 条顶层评论，每条带一条回复"""
+        for i in range(count):
+            parent = Comment.objects.create(post=self.post, user=self.readers[i % 5], content=f'评论{i}')
+            Comment.objects.create(post=self.post, user=self.readers[(i + 1) % 5], content=f'回复{i}', parent=parent)
+
+    def test_query_count_constant(self):
+        self.add_comments(1)
+        with CaptureQueriesContext(connection) as few:
+            response = self.client.get(self.url)
+        self.assertContains(response, '评论 (2)')
+
+        self.add_comments(50)
+        with self.assertNumQueries(len(few)):
+            response = self.client.get(self.url)
+        self.assertContains(response, '评论 (102)')
+
+
+class MarkdownEngineTests(SimpleTestCase):
+    """单遍渲染引擎与旧版逐条 re.sub 过滤器的输出一致性，以及旧版有误的几处写法"""
+
+    # (Markdown, 期望输出)：除 <p>/<br> 的摆放外与旧版过滤器的输出相同
+    PARITY_CASES = [
+        ("# 一级标题\n\n## 二级标题\n\n###### 六级标题", '<h1>一级标题</h1><h2>二级标题</h2><h6>六级标题</h6>'),
+        ("第一行\n第二行\n\n第二段", '<p>第一行<br>第二行</p><p>第二段</p>'),
+        ("这是 **粗体** 和 __粗体__", '<p>这是 <strong>粗体</strong> 和 <strong>粗体</strong></p>'),
+        ("这是 *斜体* 文本", '<p>这是 <em>斜体</em> 文本</p>'),
+        ("这是 ~~删除~~ 文本", '<p>这是 <del>删除</del> 文本</p>'),
+        ("调用 `render()` 函数", '<p>调用 <code>render()</code> 函数</p>'),
+        ("访问 [首页](https://example.com) 查看",
+         '<p>访问 <a href="https://example.com" target="_blank">首页</a> 查看</p>'),
+        ("> 引用内容", '<blockquote><p>引用内容</p></blockquote>'),
+        ("- 第一项\n- 第二项\n* 第三项", '<ul><li>第一项</li><li>第二项</li><li>第三项</li></ul>'),
+        ("1. 第一步\n2. 第二步", '<ol><li>第一步</li><li>第二步</li></ol>'),
+        ("上文\n\n---\n\n下文", '<p>上文</p><hr><p>下文</p>'),
+        ("```python\nx = 1\ny = 2\n```", '<pre><code class="language-python">x = 1\ny = 2</code></pre>'),
+        (
+            "## 笔记\n\n**ORM** 和 *N+1*，见 [文档](https://example.com)。\n第二行 `select_related` ~~旧~~\n\n"
+            "- __预取__\n- 索引\n\n1. EXPLAIN\n\n> 引用\n\n```python\nx = 1\n```\n\n---",
+            '<h2>笔记</h2><p><strong>ORM</strong> 和 <em>N+1</em>，见 <a href="https://example.com" target="_blank">文档</a>。'
+            '<br>第二行 <code>select_related</code> <del>旧</del></p><ul><li><strong>预取</strong></li><li>索引</li></ul>'
+            '<ol><li>EXPLAIN</li></ol><blockquote><p>引用</p></blockquote>'
+            '<pre><code class="language-python">x = 1</code></pre><hr>',
+        ),
+    ]
+
+    def test_parity_with_legacy_filter(self):
+        for markdown, expected in self.PARITY_CASES:
+            with self.subTest(markdown=markdown):
+                self.assertEqual(render(markdown), expected)
+
+    def test_legacy_bugs_fixed(self):
+        # 代码块内容转义且不再套用行内规则；snake_case 不是斜体；图片渲染为 <img>；*** 是分割线
+        self.assertEqual(
+            render("```html\n<b>a</b> **x**\n```\n\nsnake_case_name ![图](a.png)\n\n***"),
+            '<pre><code class="language-html">&lt;b&gt;a&lt;/b&gt; **x**</code></pre>'
+            '<p>snake_case_name <img src="a.png" alt="图" class="img-fluid" /></p><hr>',
+        )
+
+    def test_gfm_blocks(self):
+        self.assertEqual(
+            render("- a\n  - b\n    1. c\n- d"),
+            '<ul><li>a<ul><li>b<ol><li>c</li></ol></li></ul></li><li>d</li></ul>',
+        )
+        self.assertEqual(
+            render("> 第一行\n> 第二行\n>\n> > 嵌套"),
+            '<blockquote><p>第一行<br>第二行</p><blockquote><p>嵌套</p></blockquote></blockquote>',
+        )
+        self.assertEqual(
+            render("| 名称 | 数量 |\n|:---|---:|\n| a \\| b | 1 |"),
+            '<table class="table table-bordered"><thead><tr><th style="text-align: left">名称</th>'
+            '<th style="text-align: right">数量</th></tr></thead><tbody><tr><td style="text-align: left">a | b</td>'
+            '<td style="text-align: right">1</td></tr></tbody></table>',
+        )
+
+    def test_quote_depth_limited(self):
+        html = render('>' * 3000 + ' x')
+        self.assertEqual(html.count('<blockquote>'), MAX_QUOTE_DEPTH)
+
+
+class RelatedRefreshTests(TestCase):
+    """相关文章只在标签、分类或发布状态变化时登记刷新，增量刷新的结果与全量重建一致"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user('author', password='pw')
+        cls.categories = [Category.objects.create(name=f'分类{i}') for i in range(2)]
+        cls.tags = [Tag.objects.create(name=f'标签{i}') for i in range(4)]
+        cls.posts = []
+        with cls.captureOnCommitCallbacks(execute=True):
+            for i in range(8):
+                post = Post.objects.create(
+                    title=f'文章{i}', content='正文', category=cls.categories[i % 2], author=cls.author,
+                )
+                post.tags.set(cls.tags[i % 3:i % 3 + 2])
+                cls.posts.append(post)
+        # 全量重建同时清空之前的登记
+        related.rebuild_related()
+
+    def save(self, post, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            post.save(**kwargs)
+
+    def snapshot(self):
+        return list(RelatedPost.objects.order_by('post_id', 'rank').values_list('post_id', 'related_id', 'rank'))
+
+    def test_content_change_not_queued(self):
+        self.assertFalse(RelatedRefresh.objects.exists())
+        post = self.posts[0]
+        post.content = '修改后的正文'
+        self.save(post)
+        self.save(post, update_fields=['content'])
+        self.assertFalse(RelatedRefresh.objects.exists())
+
+    def test_refresh_matches_rebuild(self):
+        post = self.posts[0]
+        post.category = self.categories[1]
+        self.save(post)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.posts[3].tags.add(self.tags[3])
+        self.posts[5].is_published = False
+        self.save(self.posts[5])
+        self.assertEqual(RelatedRefresh.objects.filter(expand=True).count(), 3)
+
+        while related.refresh_pending() is not None:
+            pass
+        self.assertFalse(RelatedRefresh.objects.exists())
+        incremental = self.snapshot()
+        related.rebuild_related()
+        self.assertEqual(incremental, self.snapshot())
+
+
+@override_settings(IMAGE_JOB_MAX_ATTEMPTS=3, IMAGE_JOB_RETRY_DELAY=30, IMAGE_JOB_LOCK_TIMEOUT=600)
+class ImageJobQueueTests(TestCase):
+    """图片任务的登记、领取、指数退避重试和失败标记（图片保存到临时目录）"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('author', password='pw')
+        cls.post = Post.objects.create(title='文章', content='正文', author=cls.user)
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        storage = {'BACKEND': 'django.core.files.storage.FileSystemStorage'}
+        overrides = override_settings(
+            MEDIA_ROOT=media_root,
+            STORAGES={
+                'default': storage,
+                'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+                'images': {**storage, 'OPTIONS': {'location': media_root, 'base_url': '/media/'}},
+            },
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def upload(self, color='red', name='cover.png'):
+        buffer = io.BytesIO()
+        Image.new('RGB', (600, 400), color).save(buffer, 'PNG')
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+    def claim(self):
+        job = image_jobs.claim_job()
+        self.assertIsNotNone(job)
+        return job
+
+    def make_due(self, job):
+        ImageJob.objects.filter(pk=job.pk).update(run_after=timezone.now())
+
+    def test_enqueue_claim_and_process(self):
+        job = image_jobs.enqueue('cover', self.upload(), self.user, post=self.post)
+        self.assertEqual(job.status, 'pending')
+        self.assertTrue(job.source)
+
+        claimed = self.claim()
+        self.assertEqual((claimed.pk, claimed.status, claimed.attempts), (job.pk, 'processing', 1))
+        self.assertIsNone(image_jobs.claim_job())
+
+        self.assertEqual(image_jobs.process_job(claimed), 'done')
+        claimed.refresh_from_db()
+        self.assertFalse(claimed.source)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.cover_image, claimed.result_url)
+        self.assertEqual([v['width'] for v in self.post.cover_variants if v['format'] == 'jpeg'], [240, 480, 600])
+
+        # 相同内容的图片直接复用已有结果，不再登记处理
+        again = image_jobs.enqueue('cover', self.upload(), self.user, post=self.post)
+        self.assertEqual((again.status, again.result_url), ('done', claimed.result_url))
+        self.assertFalse(again.source)
+        self.assertIsNone(image_jobs.claim_job())
+
+    def test_stale_processing_job_reclaimed(self):
+        job = image_jobs.enqueue('cover', self.upload(), self.user, post=self.post)
+        self.claim()
+        self.assertIsNone(image_jobs.claim_job())
+
+        ImageJob.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(seconds=601))
+        self.assertEqual(self.claim().attempts, 2)
+
+    @mock.patch('blog.image_jobs.upload_image', side_effect=OSError('上传失败'))
+    def test_retry_backoff_then_failed(self, upload_image):
+        job = image_jobs.enqueue('cover', self.upload(), self.user, post=self.post)
+
+        for attempt, delay in ((1, 30), (2, 60)):
+            claimed = self.claim()
+            self.assertEqual(claimed.attempts, attempt)
+            before = timezone.now()
+            self.assertEqual(image_jobs.process_job(claimed), 'pending')
+            claimed.refresh_from_db()
+            self.assertEqual(claimed.last_error, '上传失败')
+            self.assertGreaterEqual(claimed.run_after, before + timedelta(seconds=delay))
+            self.assertLessEqual(claimed.run_after, timezone.now() + timedelta(seconds=delay))
+            # 退避时间未到不会被领取
+            self.assertIsNone(image_jobs.claim_job())
+            self.make_due(claimed)
+
+        claimed = self.claim()
+        self.assertEqual(image_jobs.process_job(claimed), 'failed')
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 3))
+        self.assertFalse(job.source)
+        self.assertIsNone(image_jobs.claim_job())
+        self.post.refresh_from_db()
+        self.assertFalse(self.post.cover_image)
+
+    def test_invalid_image_fails_without_retry(self):
+        upload = SimpleUploadedFile('cover.png', b'not an image', content_type='image/png')
+        job = image_jobs.enqueue('cover', upload, self.user, post=self.post)
+
+        self.assertEqual(image_jobs.process_job(self.claim()), 'failed')
+        job.refresh_from_db()
+        self.assertEqual(job.attempts, 1)
+        self.assertIn('无法识别的图片', job.last_error)
+        self.assertIsNone(image_jobs.claim_job())
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class SearchTests(TestCase):
+    """单独的汉字只按子串匹配，其余词项仍按 BM25 排序"""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user('author', password='pw')
+        cls.posts = {
+            key: Post.objects.create(title=title, content=content, author=author)
+            for key, title, content in (
+                ('both', '数据库索引', '索引的原理和数据库索引的维护'),
+                ('once', '数据库索引', '用于查询的结构'),
+                ('none', '数据库索引', '原理'),
+                ('other', '缓存', '查询缓存'),
+            )
+        }
+
+    def ids(self, *keys):
+        return [self.posts[key].pk for key in keys]
+
+    def test_bigram_terms(self):
+        self.assertCountEqual(search_post_ids('数据库 索引'), self.ids('both', 'once', 'none'))
+
+    def test_single_character_filters_bm25_results(self):
+        self.assertEqual(search_post_ids('索引 查'), self.ids('once'))
+        self.assertEqual(search_post_ids('索引 的'), self.ids('both', 'once'))
+
+    def test_single_characters_only(self):
+        self.assertEqual(search_post_ids('查'), self.ids('other', 'once'))
+        self.assertEqual(search_post_ids('查 存'), self.ids('other'))
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class PageCacheKeyTests(SimpleTestCase):
+    """页面缓存键只取视图读取的查询参数"""
+
+    params = ('category', 'vip_only', 'cursor')
+
+    def key(self, url):
+        return page_cache_key(RequestFactory().get(url), self.params)
+
+    def test_parameter_order_ignored(self):
+        self.assertEqual(self.key('/?category=1&cursor=abc'), self.key('/?cursor=abc&category=1'))
+        self.assertNotEqual(self.key('/?category=1'), self.key('/?category=2'))
+        self.assertNotEqual(self.key('/'), self.key('/tag/1/'))
+
+    def test_unknown_parameters_not_cached(self):
+        self.assertIsNotNone(self.key('/?category=1'))
+        self.assertIsNone(self.key('/?category=1&utm_source=x'))
+        self.assertIsNone(page_cache_key(RequestFactory().get('/post/1/?_=1')))
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})
+class RenderCacheTests(SimpleTestCase):
+    """进程内渲染缓存按占用字节数淘汰，过大的结果不缓存"""
+
+    def test_bounded_by_bytes(self):
+        render_cache = RenderCache('test', lambda text: text * 10, max_bytes=64 * 1024)
+        for i in range(200):
+            render_cache(f'{i:0100d}')
+        stats = render_cache.stats()
+        self.assertLessEqual(stats['bytes'], 64 * 1024)
+        self.assertLess(stats['size'], 200)
+
+        # 最近使用的条目保留，最早的被淘汰
+        render_cache(f'{199:0100d}')
+        render_cache(f'{0:0100d}')
+        self.assertEqual(render_cache.stats()['local_hits'], 1)
+
+    def test_large_result_not_cached(self):
+        render_cache = RenderCache('test', lambda text: text * 10, max_bytes=64 * 1024)
+        render_cache('x' * 1000)
+        render_cache('x' * 1000)
+        self.assertEqual(render_cache.stats()['size'], 0)
+        self.assertEqual(render_cache.stats()['misses'], 2)
+
+
+class MonthlyPostCountTests(TestCase):
+    """月度文章数按本地时区的月份边界统计"""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user('author', password='pw')
+        category = Category.objects.create(name='分类')
+        tz = timezone.get_current_timezone()
+        for index, (moment, published, in_category) in enumerate((
+            (datetime(2026, 1, 31, 23, 59), True, True),
+            # 本地时间 2 月 1 日 0 点，UTC 仍是 1 月
+            (datetime(2026, 2, 1, 0, 0), True, True),
+            (datetime(2026, 2, 15), True, False),
+            (datetime(2026, 2, 20), False, True),
+            (datetime(2026, 4, 1), True, True),
+        )):
+            post = Post.objects.create(
+                title=f'文章{index}', content='正文', author=author, is_published=published,
+                category=category if in_category else None,
+            )
+            Post.objects.filter(pk=post.pk).update(created_at=timezone.make_aware(moment, tz))
+        cls.category = category
+
+    def test_counts_by_month(self):
+        starts, counts = monthly_post_counts((2026, 1), (2026, 4))
+        self.assertEqual([start.month for start in starts], [1, 2, 3])
+        self.assertEqual(counts, [1, 2, 0])
+        self.assertEqual(monthly_post_counts((2026, 1), (2026, 4), published_only=False)[1], [1, 3, 0])
+
+    def test_counts_by_category(self):
+        _, counts = monthly_post_counts((2026, 1), (2026, 5), by_category=True)
+        self.assertEqual(counts, {self.category.pk: [1, 1, 0, 1], None: [0, 1, 0, 0]})
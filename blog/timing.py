@@ -0,0 +1,147 @@
+"""
+请求内分段计时
+
+一个请求开始收集（collect）后，代码中的 span(name) 把耗时累加到同名分段上，
+用于 Server-Timing 响应头和 /metrics 指标。没有在收集时 span 几乎不做任何事。
+
+- db：所有 SQL 的执行时间（connection.execute_wrapper），同时记录查询数
+- render：模板渲染，只计最外层模板（install_template_timing 之后生效）
+- markdown、sidebar、storage 等：由相应代码用 span 标出
+- 同名分段嵌套时只计最外层，避免重复计算；不同分段可以重叠（例如 markdown 在 render 之内）
+
+ServerTimingMiddleware 对管理员，或携带与 SERVER_TIMING_TOKEN 一致的 server_timing Cookie 的请求，
+把各分段耗时写入 Server-Timing 响应头，可以在浏览器开发者工具的 Timing 面板中查看。
+"""
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.template.base import Template
+from django.utils.crypto import constant_time_compare
+
+
+SERVER_TIMING_COOKIE = 'server_timing'
+
+_local = threading.local()
+_original_template_render = Template._render
+
+
+class Timings:
+    """一个请求中各分段的累计耗时（秒）和次数"""
+
+    def __init__(self):
+        self.durations = defaultdict(float)
+        self.counts = defaultdict(int)
+        self._active = set()
+        self.started = time.perf_counter()
+
+    def add(self, name, seconds):
+        self.durations[name] += seconds
+        self.counts[name] += 1
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+
+def current():
+    """当前线程正在收集的 Timings，没有时返回 None"""
+    return getattr(_local, 'timings', None)
+
+
+@contextmanager
+def span(name):
+    """统计代码块的耗时"""
+    timings = current()
+    if timings is None or name in timings._active:
+        yield
+        return
+
+    timings._active.add(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings._active.discard(name)
+        timings.add(name, time.perf_counter() - start)
+
+
+def _record_query(execute, sql, params, many, context):
+    timings = current()
+    if timings is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.add('db', time.perf_counter() - start)
+
+
+@contextmanager
+def collect():
+    """
+    在当前线程收集分段耗时；外层已经在收集时沿用外层的 Timings
+    """
+    outer = current()
+    if outer is not None:
+        yield outer
+        return
+
+    timings = Timings()
+    _local.timings = timings
+    try:
+        with connection.execute_wrapper(_record_query):
+            yield timings
+    finally:
+        _local.timings = None
+
+
+def _timed_template_render(self, context):
+    with span('render'):
+        return _original_template_render(self, context)
+
+
+def install_template_timing():
+    """统计模板渲染耗时（由启用的中间件在启动时调用）"""
+    Template._render = _timed_template_render
+
+
+def server_timing_header(timings):
+    """Server-Timing 响应头的值"""
+    entries = [f'total;dur={timings.elapsed() * 1000:.1f}']
+    for name, seconds in timings.durations.items():
+        entry = f'{name};dur={seconds * 1000:.1f}'
+        if name == 'db':
+            entry += f';desc="{timings.counts[name]} queries"'
+        entries.append(entry)
+    return ', '.join(entries)
+
+
+class ServerTimingMiddleware:
+    """为管理员或带调试 Cookie 的请求输出 Server-Timing 响应头"""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'SERVER_TIMING_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        install_template_timing()
+
+    def _wanted(self, request):
+        token = getattr(settings, 'SERVER_TIMING_TOKEN', '')
+        cookie = request.COOKIES.get(SERVER_TIMING_COOKIE)
+        if token and cookie and constant_time_compare(cookie, token):
+            return True
+        user = request.user
+        return user.is_authenticated and (user.is_staff or user.is_admin or user.is_superuser)
+
+    def __call__(self, request):
+        if not self._wanted(request):
+            return self.get_response(request)
+
+        with collect() as timings:
+            response = self.get_response(request)
+            response['Server-Timing'] = server_timing_header(timings)
+        return response
@@ -11,6 +11,7 @@ urlpatterns = [
     path('post/<int:pk>/', views.post_detail, name='post_detail'),
     path('category/<int:pk>/', views.category_posts, name='category_posts'),
     path('tag/<int:pk>/', views.tag_posts, name='tag_posts'),
+    path('hot/', views.hot_posts, name='hot_posts'),
     
     # 分类和标签页面
     path('categories/', views.categories, name='categories'),
@@ -27,8 +28,10 @@ urlpatterns = [
     path('profile/', views.profile, name='profile'),
     path('change-password/', views.change_password, name='change_password'),
     path('upload-avatar/', views.upload_avatar, name='upload_avatar'),
+    path('image-job/<int:pk>/', views.image_job_status, name='image_job_status'),
     
     # AJAX 接口
+    path('api/user-state/', views.user_state, name='user_state'),
     path('post/<int:pk>/like/', views.like_post, name='like_post'),
     path('post/<int:pk>/favorite/', views.favorite_post, name='favorite_post'),
     path('post/<int:pk>/comment/', views.add_comment, name='add_comment'),
@@ -46,4 +49,9 @@ urlpatterns = [
     path('admin/user/<int:user_id>/vip-toggle/', views.admin_user_vip_toggle, name='admin_user_vip_toggle'),
     path('admin/banners/', views.admin_banners, name='admin_banners'),
     path('admin/settings/', views.admin_settings, name='admin_settings'),
+    path('admin/profiles/', views.admin_profiles, name='admin_profiles'),
+    path('admin/profiles/<str:profile_id>/<str:fmt>/', views.admin_profile_download, name='admin_profile_download'),
+    
+    # 监控
+    path('metrics', views.metrics_view, name='metrics'),
 ]
\ No newline at end of file
@@ -1,87 +1,30 @@
 """
 Utility functions for blog app
 """
-import os
 import uuid
-from django.conf import settings
-from qiniu import Auth, put_file, etag
-import qiniu.config
+from django.core.files import File
+from qiniu.utils import etag_stream
+from .storage import get_image_storage
 
 
-def upload_to_qiniu(file_path, file_name=None):
+def content_hash(file):
     """
-    上传文件到七牛云
+    计算文件内容哈希（与七牛云的 etag 算法一致）
     """
-    if not file_name:
-        file_name = str(uuid.uuid4()) + os.path.splitext(file_path)[1]
-    
-    # 构造上传凭证
-    q = Auth(settings.QINIU_ACCESS_KEY, settings.QINIU_SECRET_KEY)
-    
-    # 上传到七牛后的文件名
-    key = f'blog-yk/images/{file_name}'
-    
-    # 生成上传Token
-    token = q.upload_token(settings.QINIU_BUCKET_NAME, key)
-    
-    # 要上传文件的本地路径
-    ret, info = put_file(token, key, file_path)
-    
-    if info.status_code == 200:
-        # 返回文件的访问URL
-        return f"http://{settings.QINIU_BUCKET_DOMAIN}/{key}"
-    else:
-        return None
+    file.seek(0)
+    digest = etag_stream(file)
+    file.seek(0)
+    return digest
 
 
-def upload_avatar_to_qiniu(file_path, user_id):
+def upload_image(file_path, directory, file_name):
     """
-    上传头像到七牛云
+    保存图片到图片存储（七牛云或本地），返回访问URL
     """
-    file_name = f"user_{user_id}_{uuid.uuid4().hex[:8]}.jpg"
-    
-    # 构造上传凭证
-    q = Auth(settings.QINIU_ACCESS_KEY, settings.QINIU_SECRET_KEY)
-    
-    # 上传到七牛后的文件名
-    key = f'blog-yk/avatar/{file_name}'
-    
-    # 生成上传Token
-    token = q.upload_token(settings.QINIU_BUCKET_NAME, key)
-    
-    # 要上传文件的本地路径
-    ret, info = put_file(token, key, file_path)
-    
-    if info.status_code == 200:
-        # 返回文件的访问URL
-        return f"http://{settings.QINIU_BUCKET_DOMAIN}/{key}"
-    else:
-        return None
-
-
-def upload_post_image_to_qiniu(file_path, post_id):
-    """
-    上传文章封面到七牛云
-    """
-    file_name = f"post_{post_id}_{uuid.uuid4().hex[:8]}.jpg"
-    
-    # 构造上传凭证
-    q = Auth(settings.QINIU_ACCESS_KEY, settings.QINIU_SECRET_KEY)
-    
-    # 上传到七牛后的文件名
-    key = f'blog-yk/images/{file_name}'
-    
-    # 生成上传Token
-    token = q.upload_token(settings.QINIU_BUCKET_NAME, key)
-    
-    # 要上传文件的本地路径
-    ret, info = put_file(token, key, file_path)
-    
-    if info.status_code == 200:
-        # 返回文件的访问URL
-        return f"http://{settings.QINIU_BUCKET_DOMAIN}/{key}"
-    else:
-        return None
+    storage = get_image_storage()
+    with open(file_path, 'rb') as f:
+        name = storage.save(f'{directory}/{file_name}', File(f))
+    return storage.url(name)
 
 
 def generate_filename(instance, filename):
@@ -0,0 +1,285 @@
+"""
+文章浏览数写缓冲（write-behind）
+
+每次访问只在当前进程内存中累加，按时间间隔或累计数量批量写回数据库，
+每个文章一次 ``F('views') + n`` 的 UPDATE（同时累加热度），避免热点文章每次访问都锁一次行。
+
+两种缓冲模式（settings.VIEW_COUNT_BUFFER）：
+- memory：各 worker 自行把内存中的计数写回数据库（默认）
+- cache：各 worker 把计数转存到共享缓存，由 flush_view_counts 命令统一写回数据库
+
+写回失败时计数留在缓冲中，下次再试，不影响当前请求；每个进程有一个后台线程按时间间隔写回，
+没有访问的进程也不会一直攥着计数。进程退出时写回失败的计数转存到共享缓存（flush_view_counts 可以写回），
+转存也失败时记录日志。
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.utils import timezone
+
+
+CACHE_KEY_PREFIX = 'blog:views:pending:'
+DAY_CACHE_KEY_PREFIX = 'blog:views:day:'
+
+# cache 模式下 flush_view_counts 回看多少天的按日计数
+DAY_KEY_LOOKBACK = 7
+
+_lock = threading.Lock()
+_pending = defaultdict(int)
+_pending_days = defaultdict(int)  # 浏览发生的日期 -> 次数，写回时计入对应日期的每日统计
+_pending_total = 0
+_last_flush = time.monotonic()
+_flusher = None
+
+logger = logging.getLogger(__name__)
+
+
+def _get_setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _buffer_mode():
+    return _get_setting('VIEW_COUNT_BUFFER', 'memory')
+
+
+def _cache_key(post_id):
+    return f'{CACHE_KEY_PREFIX}{post_id}'
+
+
+def _day_cache_key(day):
+    return f'{DAY_CACHE_KEY_PREFIX}{day.isoformat()}'
+
+
+def record_view(post_id):
+    """
+    记录一次浏览，必要时触发写回
+    """
+    global _pending_total
+
+    today = timezone.localdate()
+    with _lock:
+        _pending[post_id] += 1
+        _pending_days[today] += 1
+        _pending_total += 1
+        interval = _get_setting('VIEW_COUNT_FLUSH_INTERVAL', 10)
+        threshold = _get_setting('VIEW_COUNT_FLUSH_THRESHOLD', 1000)
+        due = (time.monotonic() - _last_flush >= interval) or _pending_total >= threshold
+
+    if _flusher is None:
+        _start_flusher()
+    if due:
+        _flush_logged()
+
+
+def _flush_logged():
+    """请求路径和后台线程中的写回：失败时记录日志，计数已放回缓冲，下次再试"""
+    try:
+        return flush()
+    except Exception:
+        logger.exception('写回浏览数失败，计数保留在缓冲中稍后重试')
+        return 0
+
+
+def _start_flusher():
+    global _flusher
+
+    with _lock:
+        if _flusher is not None:
+            return
+        _flusher = threading.Thread(target=_flush_periodically, name='view-counter-flush', daemon=True)
+    _flusher.start()
+
+
+def _flush_periodically():
+    """后台线程：按时间间隔写回缓冲中的计数"""
+    while True:
+        interval = _get_setting('VIEW_COUNT_FLUSH_INTERVAL', 10)
+        time.sleep(interval)
+        with _lock:
+            due = _pending_total > 0 and time.monotonic() - _last_flush >= interval
+        if due:
+            _flush_logged()
+            # 线程自己的数据库连接用完即关，不长期占用
+            connections.close_all()
+
+
+def pending_views(post_id):
+    """
+    当前进程中尚未写回的浏览数（用于页面展示）
+    """
+    with _lock:
+        return _pending.get(post_id, 0)
+
+
+def _take_pending():
+    """取出并清空当前进程的缓冲"""
+    global _pending, _pending_days, _pending_total, _last_flush
+
+    with _lock:
+        pending, days = _pending, _pending_days
+        _pending = defaultdict(int)
+        _pending_days = defaultdict(int)
+        _pending_total = 0
+        _last_flush = time.monotonic()
+    return pending, days
+
+
+def _restore_pending(pending, days):
+    """写回失败时把计数放回缓冲，避免丢失"""
+    global _pending_total
+
+    with _lock:
+        for post_id, count in pending.items():
+            _pending[post_id] += count
+            _pending_total += count
+        for day, count in days.items():
+            _pending_days[day] += count
+
+
+def _write_to_db(pending, days):
+    """
+    批量写回数据库，相同增量的文章合并为一条 UPDATE，并按浏览发生的日期累加到每日统计
+    """
+    from .models import Post, DailyStats
+
+    by_count = defaultdict(list)
+    for post_id, count in pending.items():
+        if count > 0:
+            by_count[count].append(post_id)
+
+    with transaction.atomic():
+        for count, post_ids in by_count.items():
+            Post.objects.filter(pk__in=post_ids).update(**Post.counter_update('views', count))
+        for day, count in days.items():
+            if count > 0:
+                DailyStats.add_views(count, day)
+
+    return sum(pending.values())
+
+
+def _cache_add(key, count):
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key, count)
+    except ValueError:
+        # 键在 add 与 incr 之间过期被淘汰
+        cache.set(key, count, timeout=None)
+
+
+def _spill_to_cache(pending, days):
+    """把计数转存到共享缓存"""
+    for post_id, count in pending.items():
+        _cache_add(_cache_key(post_id), count)
+    for day, count in days.items():
+        _cache_add(_day_cache_key(day), count)
+    return sum(pending.values())
+
+
+def flush():
+    """
+    写回当前进程缓冲的浏览数，返回写回的浏览次数
+    """
+    pending, days = _take_pending()
+    if not pending:
+        return 0
+
+    try:
+        if _buffer_mode() == 'cache':
+            return _spill_to_cache(pending, days)
+        return _write_to_db(pending, days)
+    except Exception:
+        _restore_pending(pending, days)
+        raise
+
+
+def drain_cache(batch_size=500):
+    """
+    把共享缓存中的浏览数写回数据库（cache 模式下由管理命令调用）
+    """
+    from .models import Post
+
+    flushed = 0
+    post_ids = Post.objects.values_list('pk', flat=True).order_by('pk')
+
+    batch = []
+    for post_id in post_ids.iterator(chunk_size=batch_size):
+        batch.append(post_id)
+        if len(batch) >= batch_size:
+            flushed += _drain_batch(batch)
+            batch = []
+    if batch:
+        flushed += _drain_batch(batch)
+
+    _drain_days()
+    return flushed
+
+
+def _drain_days():
+    """把共享缓存中最近几天的按日浏览数写入每日统计"""
+    today = timezone.localdate()
+    keys = {
+        _day_cache_key(today - timedelta(days=offset)): today - timedelta(days=offset)
+        for offset in range(DAY_KEY_LOOKBACK)
+    }
+    days = {}
+    for key, count in cache.get_many(list(keys)).items():
+        if count:
+            cache.decr(key, count)
+            days[keys[key]] = count
+    if not days:
+        return
+
+    try:
+        _write_to_db({}, days)
+    except Exception:
+        for day, count in days.items():
+            cache.incr(_day_cache_key(day), count)
+        raise
+
+
+def _drain_batch(post_ids):
+    keys = {_cache_key(post_id): post_id for post_id in post_ids}
+    values = cache.get_many(list(keys))
+
+    pending = {}
+    for key, count in values.items():
+        if not count:
+            continue
+        # 用 decr 而不是 delete，保留读取之后新增的计数
+        cache.decr(key, count)
+        pending[keys[key]] = count
+
+    if not pending:
+        return 0
+
+    try:
+        return _write_to_db(pending, {})
+    except Exception:
+        for post_id, count in pending.items():
+            cache.incr(_cache_key(post_id), count)
+        raise
+
+
+def _flush_at_exit():
+    try:
+        flush()
+    except Exception:
+        logger.exception('进程退出时写回浏览数失败')
+        pending, days = _take_pending()
+        if not pending:
+            return
+        try:
+            _spill_to_cache(pending, days)
+            logger.warning('已将 %s 次浏览转存到共享缓存，可执行 flush_view_counts 写回', sum(pending.values()))
+        except Exception:
+            logger.exception('转存到共享缓存也失败，丢失的浏览数：%s', dict(pending))
+
+
+atexit.register(_flush_at_exit)
@@ -4,19 +4,35 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.core.paginator import Paginator
 from django.db.models import Q, Count
-from django.http import JsonResponse
-from django.views.decorators.csrf import csrf_exempt
+from django.http import JsonResponse, HttpResponse, Http404, FileResponse
+from django.views.decorators.csrf import csrf_exempt, ensure_csrf_cookie
 from django.views.decorators.http import require_POST
 from django.conf import settings
+from django.utils import timezone
+from django.utils.cache import add_never_cache_headers
+from django.utils.crypto import constant_time_compare
 import json
 import os
-import tempfile
-from PIL import Image
-
-from .models import Post, Category, Tag, Comment, User, UserAction, Banner
-from .utils import upload_avatar_to_qiniu, upload_post_image_to_qiniu
-
 
+from .models import Post, Category, Tag, Comment, User, UserAction, Banner, ImageJob
+from . import image_jobs
+from .sidebar import get_sidebar_data
+from . import render_cache
+from .search import search_post_ids
+from . import related
+from . import hot
+from .pagination import CURSOR_PARAM, KeysetPaginator
+from .comments import load_comment_tree
+from .stats import get_totals, yearly_post_counts
+from .page_cache import cache_anonymous_page
+from .conditional import conditional_page, post_validators, listing_validators
+from . import view_counter
+from . import metrics
+from . import profiling
+
+
+@conditional_page(listing_validators)
+@cache_anonymous_page(params=('category', 'vip_only', CURSOR_PARAM))
 def index(request):
     """首页视图"""
     # 轮播图横幅
@@ -26,8 +42,8 @@ def index(request):
     category_id = request.GET.get('category')
     vip_only = request.GET.get('vip_only')
     
-    # 获取已发布的文章，支持分类和VIP筛选
-    posts = Post.objects.filter(is_published=True).select_related('category', 'author').prefetch_related('tags')
+    # 获取已发布的文章，支持分类和VIP筛选（列表不需要正文）
+    posts = Post.objects.filter(is_published=True).select_related('category', 'author').prefetch_related('tags').defer('content', 'content_html')
     
     # VIP筛选
     if vip_only:
@@ -42,47 +58,40 @@ def index(request):
         except Category.DoesNotExist:
             pass
     
-    # 分页
-    paginator = Paginator(posts, 5)  # 每页5篇文章
-    page_number = request.GET.get('page')
-    posts = paginator.get_page(page_number)
-    
-    # 最近文章（包含VIP文章，用于显示标识）
-    recent_posts = Post.objects.filter(is_published=True).order_by('-created_at')[:5]
-    
-    # 推荐阅读（按浏览量排序，包含VIP文章）
-    recommended_posts = Post.objects.filter(is_published=True).order_by('-views', '-likes')[:5]
-    
-    # 分类统计
-    categories = Category.objects.annotate(post_count=Count('post')).filter(post_count__gt=0)[:10]
+    # 游标分页
+    posts = KeysetPaginator(posts, 5).get_page(request)  # 每页5篇文章
     
-    # 热门标签
-    tags = Tag.objects.annotate(post_count=Count('post')).filter(post_count__gt=0).order_by('-post_count')[:20]
+    # 推荐阅读（按热度排序，包含VIP文章）
+    recommended_posts = hot.hot_posts().defer('content', 'content_html')[:5]
     
     context = {
         'banners': banners,
         'posts': posts,
-        'recent_posts': recent_posts,
         'recommended_posts': recommended_posts,
-        'categories': categories,
-        'tags': tags,
         'current_category': current_category,
         'site_name': settings.SITE_NAME,
         'site_description': settings.SITE_DESCRIPTION,
     }
     
+    # 侧边栏：最近文章、分类统计、热门标签
+    context.update(get_sidebar_data())
+    
     return render(request, 'blog/index.html', context)
 
 
+@conditional_page(post_validators, on_not_modified=lambda request, pk: view_counter.record_view(pk))
+@cache_anonymous_page(on_hit=lambda request, pk: view_counter.record_view(pk))
 def post_detail(request, pk):
     """文章详情页"""
-    post = get_object_or_404(Post, pk=pk, is_published=True)
+    post = get_object_or_404(Post.objects.select_related('author', 'category'), pk=pk, is_published=True)
     
     # VIP文章访问控制
     if post.is_vip_only:
         if not request.user.is_authenticated:
-            # 未登录用户直接跳转到VIP升级页面
-            return render(request, 'blog/vip_upgrade.html', {'post': post})
+            # 未登录用户直接跳转到VIP升级页面（不进入页面缓存，命中缓存时也就不会计入浏览数）
+            response = render(request, 'blog/vip_upgrade.html', {'post': post})
+            add_never_cache_headers(response)
+            return response
         elif not request.user.is_vip_active():
             # 非VIP用户或VIP已过期
             return render(request, 'blog/vip_upgrade.html', {
@@ -93,71 +102,58 @@ def post_detail(request, pk):
     # 增加浏览量
     post.increment_views()
     
-    # 获取评论
-    comments = Comment.objects.filter(post=post, is_approved=True, parent=None).order_by('-created_at')
+    # 获取评论（一次查询组装评论树）
+    comments, comment_total = load_comment_tree(post)
     
-    # 相关文章（包含VIP文章，用于显示标识）
-    related_posts = Post.objects.filter(
-        category=post.category, 
-        is_published=True
-    ).exclude(pk=post.pk)[:4]
-    
-    # 检查用户是否已点赞/收藏
-    user_liked = False
-    user_favorited = False
-    if request.user.is_authenticated:
-        user_liked = UserAction.objects.filter(
-            user=request.user, post=post, action='like'
-        ).exists()
-        user_favorited = UserAction.objects.filter(
-            user=request.user, post=post, action='favorite'
-        ).exists()
-    
-    # 侧边栏数据
-    recent_posts = Post.objects.filter(is_published=True).order_by('-created_at')[:5]
-    categories = Category.objects.annotate(post_count=Count('post')).filter(post_count__gt=0)[:10]
-    tags = Tag.objects.annotate(post_count=Count('post')).filter(post_count__gt=0).order_by('-post_count')[:20]
+    # 相关文章（预先按标签相似度计算，包含VIP文章，用于显示标识）
+    related_posts = related.related_posts(post)
     
+    # 点赞/收藏状态由前端通过 user_state 接口加载，页面内容与用户无关，可以整页缓存
     context = {
         'post': post,
         'comments': comments,
+        'comment_total': comment_total,
         'related_posts': related_posts,
-        'recent_posts': recent_posts,
-        'categories': categories,
-        'tags': tags,
-        'user_liked': user_liked,
-        'user_favorited': user_favorited,
     }
     
+    # 侧边栏数据
+    context.update(get_sidebar_data())
+    
     return render(request, 'blog/post_detail.html', context)
 
 
+@conditional_page(listing_validators)
+@cache_anonymous_page(params=(CURSOR_PARAM,))
 def category_posts(request, pk):
     """分类文章列表"""
     category = get_object_or_404(Category, pk=pk)
-    posts = Post.objects.filter(category=category, is_published=True)  # 包含VIP文章
+    posts = Post.objects.filter(category=category, is_published=True).select_related('category').defer('content', 'content_html')  # 包含VIP文章
     
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get('page')
-    posts = paginator.get_page(page_number)
+    posts = KeysetPaginator(posts, 10).get_page(request)
     
+    sidebar = get_sidebar_data()
     context = {
         'posts': posts,
         'category': category,
         'title': f'{category.name} - 分类文章',
+        'recent_posts': sidebar['recent_posts'],
+        'categories': sidebar['categories'],
+        'all_categories': sidebar['categories'],
+        # 已发布文章数取侧边栏缓存中的各分类统计，不再单独 COUNT
+        'category_post_count': sidebar['published_counts'].get(category.pk, 0),
     }
     
     return render(request, 'blog/category_posts.html', context)
 
 
+@conditional_page(listing_validators)
+@cache_anonymous_page(params=(CURSOR_PARAM,))
 def tag_posts(request, pk):
     """标签文章列表"""
     tag = get_object_or_404(Tag, pk=pk)
-    posts = Post.objects.filter(tags=tag, is_published=True)  # 包含VIP文章
+    posts = Post.objects.filter(tags=tag, is_published=True).select_related('category').defer('content', 'content_html')  # 包含VIP文章
     
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get('page')
-    posts = paginator.get_page(page_number)
+    posts = KeysetPaginator(posts, 10).get_page(request)
     
     context = {
         'posts': posts,
@@ -168,6 +164,19 @@ def tag_posts(request, pk):
     return render(request, 'blog/tag_posts.html', context)
 
 
+@cache_anonymous_page()
+def hot_posts(request):
+    """热门文章（按随时间衰减的热度排序）"""
+    posts = hot.hot_posts().select_related('category').defer('content', 'content_html')[:settings.HOT_POSTS_LIMIT]
+    
+    context = {
+        'posts': posts,
+        'title': '热门文章',
+    }
+    
+    return render(request, 'blog/hot_posts.html', context)
+
+
 def categories(request):
     """分类列表页"""
     categories = Category.objects.annotate(post_count=Count('post')).filter(post_count__gt=0)
@@ -198,16 +207,15 @@ def search(request):
     posts = []
     
     if query:
-        posts = Post.objects.filter(
-            Q(title__icontains=query) | 
-            Q(summary__icontains=query) | 
-            Q(content__icontains=query),
-            is_published=True
-        ).distinct()  # 包含VIP文章，显示时会有标识
+        # 倒排索引按相关度排序，只取当前页的文章
+        post_ids = search_post_ids(query)  # 包含VIP文章，显示时会有标识
         
-        paginator = Paginator(posts, 10)
+        paginator = Paginator(post_ids, 10)
         page_number = request.GET.get('page')
         posts = paginator.get_page(page_number)
+        
+        page_posts = Post.objects.select_related('category').defer('content', 'content_html').in_bulk(posts.object_list)
+        posts.object_list = [page_posts[pk] for pk in posts.object_list if pk in page_posts]
     
     context = {
         'posts': posts,
@@ -296,10 +304,18 @@ def profile(request):
         is_published=True
     )[:10]
     
+    # 尚未处理完的头像任务，页面轮询其状态
+    avatar_job = ImageJob.objects.filter(
+        user=request.user,
+        kind='avatar',
+        status__in=['pending', 'processing']
+    ).order_by('-pk').first()
+    
     context = {
         'title': '个人中心',
         'liked_posts': liked_posts,
         'favorited_posts': favorited_posts,
+        'avatar_job': avatar_job,
     }
     
     return render(request, 'blog/profile.html', context)
@@ -348,32 +364,12 @@ def upload_avatar(request):
             return redirect('blog:profile')
         
         try:
-            # 创建临时文件处理图片
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as temp_file:
-                # 处理图片
-                with Image.open(avatar_file) as img:
-                    # 转换为RGB模式（如果是RGBA）
-                    if img.mode in ('RGBA', 'LA', 'P'):
-                        img = img.convert('RGB')
-                    
-                    # 缩放到200x200
-                    img.thumbnail((200, 200), Image.Resampling.LANCZOS)
-                    img.save(temp_file.name, 'JPEG', quality=85)
-                
-                # 上传到七牛云
-                qiniu_url = upload_avatar_to_qiniu(temp_file.name, request.user.id)
-                
-                if qiniu_url:
-                    # 更新用户头像URL
-                    request.user.avatar = qiniu_url
-                    request.user.save()
-                    messages.success(request, '头像上传成功')
-                else:
-                    messages.error(request, '头像上传到云存储失败')
-                
-                # 删除临时文件
-                os.unlink(temp_file.name)
-                
+            # 缩放和上传由 run_image_worker 在后台完成
+            job = image_jobs.enqueue('avatar', avatar_file, request.user)
+            if job.status == 'done':
+                messages.success(request, '头像上传成功')
+            else:
+                messages.success(request, '头像已上传，正在处理中')
         except Exception as e:
             messages.error(request, f'头像上传失败：{str(e)}')
     else:
@@ -382,97 +378,91 @@ def upload_avatar(request):
     return redirect('blog:profile')
 
 
+@login_required
+def image_job_status(request, pk):
+    """图片处理任务状态（供上传页面轮询）"""
+    job = get_object_or_404(ImageJob, pk=pk)
+    if job.user_id != request.user.pk and not request.user.is_admin and not request.user.is_superuser:
+        return JsonResponse({
+            'success': False,
+            'message': '您没有权限查看此任务'
+        }, status=403)
+    
+    return JsonResponse({
+        'success': True,
+        **image_jobs.job_status(job)
+    })
+
+
 # AJAX 视图
+@ensure_csrf_cookie
+def user_state(request):
+    """当前用户的个人数据（缓存页面加载后由前端获取），可选 ?post=ID 返回该文章的点赞/收藏状态"""
+    data = {'authenticated': request.user.is_authenticated}
+    if request.user.is_authenticated:
+        data.update({
+            'username': request.user.username,
+            'avatar': request.user.avatar or '',
+            'is_admin': request.user.is_admin or request.user.is_superuser,
+        })
+    
+    post_id = request.GET.get('post', '')
+    if post_id.isdigit():
+        counts = Post.objects.filter(pk=post_id, is_published=True).values('likes', 'favorites').first()
+        if counts:
+            actions = set()
+            if request.user.is_authenticated:
+                actions = set(UserAction.objects.filter(
+                    user=request.user, post_id=post_id
+                ).values_list('action', flat=True))
+            data['post'] = {
+                'likes': counts['likes'],
+                'favorites': counts['favorites'],
+                'liked': 'like' in actions,
+                'favorited': 'favorite' in actions,
+            }
+    
+    response = JsonResponse(data)
+    add_never_cache_headers(response)
+    return response
+
+
 @require_POST
 def like_post(request, pk):
     """点赞文章"""
-    # 添加调试日志
-    print(f"点赞请求 - 用户: {request.user}, 是否认证: {request.user.is_authenticated}")
-    print(f"请求头: {request.headers}")
-    print(f"会话: {request.session.session_key}")
-    
     if not request.user.is_authenticated:
-        print("用户未认证，返回错误响应")
         return JsonResponse({
             'success': False,
             'message': '请先登录'
         })
     
-    post = get_object_or_404(Post, pk=pk)
-    print(f"处理文章: {post.title}")
-    
-    action, created = UserAction.objects.get_or_create(
-        user=request.user,
-        post=post,
-        action='like'
-    )
-    
-    if not created:
-        action.delete()
-        post.likes -= 1
-        liked = False
-        print(f"取消点赞，当前点赞数: {post.likes}")
-    else:
-        post.likes += 1
-        liked = True
-        print(f"添加点赞，当前点赞数: {post.likes}")
-    
-    post.save()
+    post = get_object_or_404(Post.objects.only('pk'), pk=pk)
+    liked, count = UserAction.toggle(request.user, post.pk, 'like')
     
-    response_data = {
+    return JsonResponse({
         'success': True,
         'liked': liked,
-        'count': post.likes
-    }
-    print(f"返回响应: {response_data}")
-    
-    return JsonResponse(response_data)
+        'count': count
+    })
 
 
 @require_POST
 def favorite_post(request, pk):
     """收藏文章"""
-    # 添加调试日志
-    print(f"收藏请求 - 用户: {request.user}, 是否认证: {request.user.is_authenticated}")
-    print(f"请求头: {request.headers}")
-    print(f"会话: {request.session.session_key}")
-    
     if not request.user.is_authenticated:
-        print("用户未认证，返回错误响应")
         return JsonResponse({
             'success': False,
             'message': '请先登录'
         })
     
-    post = get_object_or_404(Post, pk=pk)
-    print(f"处理文章: {post.title}")
-    
-    action, created = UserAction.objects.get_or_create(
-        user=request.user,
-        post=post,
-        action='favorite'
-    )
-    
-    if not created:
-        action.delete()
-        post.favorites -= 1
-        favorited = False
-        print(f"取消收藏，当前收藏数: {post.favorites}")
-    else:
-        post.favorites += 1
-        favorited = True
-        print(f"添加收藏，当前收藏数: {post.favorites}")
-    
-    post.save()
+    post = get_object_or_404(Post.objects.only('pk'), pk=pk)
+    favorited, count = UserAction.toggle(request.user, post.pk, 'favorite')
     
-    response_data = {
+    return JsonResponse({
         'success': True,
         'favorited': favorited,
-        'count': post.favorites
-    }
-    print(f"返回响应: {response_data}")
-    
-    return JsonResponse(response_data)
+        'count': count
+    })
 
 
 @login_required
@@ -506,11 +496,8 @@ def admin_dashboard(request):
         messages.error(request, '您没有权限访问此页面')
         return redirect('blog:index')
     
-    # 统计数据
-    total_posts = Post.objects.count()
-    published_posts = Post.objects.filter(is_published=True).count()
-    total_comments = Comment.objects.count()
-    total_users = User.objects.count()
+    # 统计数据（缓存）
+    totals = get_totals()
     
     # 最新评论
     recent_comments = Comment.objects.select_related('user', 'post').order_by('-created_at')[:10]
@@ -520,25 +507,16 @@ def admin_dashboard(request):
         post_count=Count('post', filter=Q(post__is_published=True))
     ).filter(post_count__gt=0)[:6]  # 最多显示6个分类
     
-    # 月度文章统计 (简化版本，实际项目中可能需要更复杂的查询)
-    from datetime import datetime
-    current_year = datetime.now().year
-    monthly_posts = []
-    
-    for month in range(1, 13):
-        count = Post.objects.filter(
-            created_at__year=current_year,
-            created_at__month=month,
-            is_published=True
-        ).count()
-        monthly_posts.append(count)
+    # 月度文章统计（一次查询取出全年）
+    current_year = timezone.localdate().year
+    _, monthly_posts = yearly_post_counts(current_year)
     
     context = {
         'title': '管理控制台',
-        'total_posts': total_posts,
-        'published_posts': published_posts,
-        'total_comments': total_comments,
-        'total_users': total_users,
+        'total_posts': totals['total_posts'],
+        'published_posts': totals['published_posts'],
+        'total_comments': totals['total_comments'],
+        'total_users': totals['total_users'],
         'recent_comments': recent_comments,
         'categories_with_posts': categories_with_posts,
         'monthly_posts': monthly_posts,
@@ -602,22 +580,8 @@ def admin_post_add(request):
             # 处理封面图片上传到七牛云
             if cover_image:
                 try:
-                    with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as temp_file:
-                        with Image.open(cover_image) as img:
-                            if img.mode in ('RGBA', 'LA', 'P'):
-                                img = img.convert('RGB')
-                            # 缩放封面图片到合适尺寸
-                            img.thumbnail((800, 600), Image.Resampling.LANCZOS)
-                            img.save(temp_file.name, 'JPEG', quality=85)
-                        
-                        # 上传到七牛云
-                        qiniu_url = upload_post_image_to_qiniu(temp_file.name, post.id)
-                        if qiniu_url:
-                            post.cover_image = qiniu_url
-                            post.save()
-                        
-                        # 删除临时文件
-                        os.unlink(temp_file.name)
+                    # 缩放和上传由 run_image_worker 在后台完成
+                    image_jobs.enqueue('cover', cover_image, request.user, post=post)
                 except Exception as e:
                     messages.warning(request, f'封面图片上传失败：{str(e)}')
             
@@ -665,29 +629,17 @@ def admin_post_edit(request, pk):
         post.is_featured = request.POST.get('is_featured') == 'on'
         post.is_vip_only = request.POST.get('is_vip_only') == 'on'
         
-        # 处理封面图片上传到七牛云
+        post.save()
+        
+        # 处理封面图片：在保存文章之后登记任务，避免覆盖 worker 写回的封面
         cover_image = request.FILES.get('cover_image')
         if cover_image:
             try:
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as temp_file:
-                    with Image.open(cover_image) as img:
-                        if img.mode in ('RGBA', 'LA', 'P'):
-                            img = img.convert('RGB')
-                        # 缩放封面图片到合适尺寸
-                        img.thumbnail((800, 600), Image.Resampling.LANCZOS)
-                        img.save(temp_file.name, 'JPEG', quality=85)
-                    
-                    # 上传到七牛云
-                    qiniu_url = upload_post_image_to_qiniu(temp_file.name, post.id)
-                    if qiniu_url:
-                        post.cover_image = qiniu_url
-                    
-                    # 删除临时文件
-                    os.unlink(temp_file.name)
+                # 缩放和上传由 run_image_worker 在后台完成
+                image_jobs.enqueue('cover', cover_image, request.user, post=post)
             except Exception as e:
                 messages.warning(request, f'封面图片上传失败：{str(e)}')
         
-        post.save()
         messages.success(request, '文章更新成功')
         return redirect('blog:admin_posts')
     
@@ -893,6 +845,8 @@ def admin_banners(request):
                     is_active=is_active,
                     order=order
                 )
+                # 多尺寸版本由 run_image_worker 在后台生成
+                image_jobs.enqueue('banner', image, request.user, banner=banner)
                 messages.success(request, '横幅创建成功')
             else:
                 messages.error(request, '标题和图片不能为空')
@@ -911,8 +865,11 @@ def admin_banners(request):
             new_image = request.FILES.get('image')
             if new_image:
                 banner.image = new_image
+                banner.image_variants = []
             
             banner.save()
+            if new_image:
+                image_jobs.enqueue('banner', new_image, request.user, banner=banner)
             messages.success(request, '横幅更新成功')
         
         elif action == 'delete':
@@ -946,6 +903,74 @@ def admin_settings(request):
     
     context = {
         'title': '系统设置',
+        'render_cache_stats': render_cache.stats(),
+    }
+    
+    return render(request, 'blog/admin/settings.html', context)
+
+
+@login_required
+def admin_profiles(request):
+    """性能分析结果列表，?id= 预览某次结果的报告"""
+    if not request.user.is_admin and not request.user.is_superuser:
+        messages.error(request, '您没有权限访问此页面')
+        return redirect('blog:index')
+    
+    profiles = profiling.list_profiles()
+    
+    # 预览按累计时间排序的报告
+    selected = None
+    report = ''
+    profile_id = request.GET.get('id', '')
+    if profile_id:
+        selected = next((meta for meta in profiles if meta['id'] == profile_id), None)
+        path = profiling.profile_path(profile_id, 'pstats')
+        if selected and path and os.path.exists(path):
+            report = profiling.stats_text(path)
+    
+    context = {
+        'title': '性能分析',
+        'profiles': profiles,
+        'selected': selected,
+        'report': report,
+        'profile_param': profiling.PROFILE_PARAM,
+        'profile_header': profiling.PROFILE_HEADER,
     }
     
-    return render(request, 'blog/admin/settings.html', context)
\ No newline at end of file
+    return render(request, 'blog/admin/profiles.html', context)
+
+
+@login_required
+def admin_profile_download(request, profile_id, fmt):
+    """下载性能分析结果：pstats 原始文件或折叠栈文本"""
+    if not request.user.is_admin and not request.user.is_superuser:
+        messages.error(request, '您没有权限访问此页面')
+        return redirect('blog:index')
+    
+    path = profiling.profile_path(profile_id, 'pstats')
+    if fmt not in ('pstats', 'collapsed') or not path or not os.path.exists(path):
+        raise Http404
+    
+    if fmt == 'pstats':
+        return FileResponse(open(path, 'rb'), as_attachment=True, filename=f'{profile_id}.pstats')
+    
+    response = HttpResponse(profiling.collapsed_stacks(path), content_type='text/plain; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{profile_id}.collapsed.txt"'
+    return response
+
+
+def metrics_view(request):
+    """请求指标（Prometheus 文本格式），仅管理员或携带 METRICS_TOKEN 的抓取请求可访问"""
+    if not settings.METRICS_ENABLED:
+        raise Http404
+    
+    token = settings.METRICS_TOKEN
+    authorization = request.headers.get('Authorization', '')
+    token_ok = bool(token) and constant_time_compare(authorization, f'Bearer {token}')
+    is_admin = request.user.is_authenticated and (request.user.is_admin or request.user.is_superuser)
+    if not token_ok and not is_admin:
+        return HttpResponse('Forbidden', status=403, content_type='text/plain')
+    
+    response = HttpResponse(metrics.registry.render(), content_type=metrics.CONTENT_TYPE)
+    add_never_cache_headers(response)
+    return response
@@ -40,10 +40,13 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'blog.metrics.MetricsMiddleware',  # METRICS_ENABLED 为 False 时不启用
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'blog.timing.ServerTimingMiddleware',
+    'blog.profiling.ProfilerMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -88,6 +91,15 @@ DATABASES = {
     }
 }
 
+# Cache
+# 多 worker 部署时应配置共享缓存（如 Redis），信号触发的缓存失效才能作用到所有进程
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='myblog'),
+    }
+}
+
 # 使用自定义User模型
 AUTH_USER_MODEL = 'blog.User'
 
@@ -147,6 +159,78 @@ QINIU_SECRET_KEY = config('QINIU_SECRET_KEY', default='9lZjiRtRLL0U_MuYkcUZBAL16
 QINIU_BUCKET_NAME = config('QINIU_BUCKET_NAME', default='youxuan-images')
 QINIU_BUCKET_DOMAIN = config('QINIU_BUCKET_DOMAIN', default='')
 
+# 图片存储（头像、封面、横幅）：qiniu 上传到七牛云；local 保存到 MEDIA_ROOT（离线开发、测试和基准测试用）
+IMAGE_STORAGE = config('IMAGE_STORAGE', default='qiniu')
+
+if IMAGE_STORAGE == 'local':
+    IMAGE_STORAGE_BACKEND = {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+        'OPTIONS': {
+            'location': MEDIA_ROOT / 'blog-yk',
+            'base_url': f'{MEDIA_URL}blog-yk/',
+        },
+    }
+else:
+    IMAGE_STORAGE_BACKEND = {
+        'BACKEND': 'blog.storage.QiniuStorage',
+        'OPTIONS': {
+            'location': 'blog-yk',
+        },
+    }
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+    'images': IMAGE_STORAGE_BACKEND,
+}
+
 # Custom settings
 SITE_NAME = 'MyBlog'
-SITE_DESCRIPTION = '分享技术与生活'
\ No newline at end of file
+SITE_DESCRIPTION = '分享技术与生活'
+
+# 浏览数写缓冲：memory 由各 worker 定时写回数据库；cache 转存共享缓存，由 flush_view_counts 命令写回
+VIEW_COUNT_BUFFER = config('VIEW_COUNT_BUFFER', default='memory')
+VIEW_COUNT_FLUSH_INTERVAL = config('VIEW_COUNT_FLUSH_INTERVAL', default=10, cast=int)  # 秒
+VIEW_COUNT_FLUSH_THRESHOLD = config('VIEW_COUNT_FLUSH_THRESHOLD', default=1000, cast=int)
+
+# 侧边栏缓存时间（秒），数据变化时由信号主动失效
+SIDEBAR_CACHE_TIMEOUT = config('SIDEBAR_CACHE_TIMEOUT', default=600, cast=int)
+
+# markdown 过滤器渲染缓存：每个过滤器的进程内 LRU 占用上限（字节）；超过 SHARED_MIN_SIZE 字符的文本同时写入共享缓存
+RENDER_CACHE_MAX_BYTES = config('RENDER_CACHE_MAX_BYTES', default=8 * 1024 * 1024, cast=int)
+RENDER_CACHE_SHARED_MIN_SIZE = config('RENDER_CACHE_SHARED_MIN_SIZE', default=2048, cast=int)
+RENDER_CACHE_TIMEOUT = config('RENDER_CACHE_TIMEOUT', default=86400, cast=int)
+
+# 后台汇总统计缓存时间（秒），数据变化时由信号主动失效
+STATS_CACHE_TIMEOUT = config('STATS_CACHE_TIMEOUT', default=300, cast=int)
+
+# 图片处理任务队列（run_image_worker）：最大尝试次数、首次重试间隔（秒，之后指数退避）、
+# 处理超时后可被重新领取的时间（秒）、队列为空时的轮询间隔（秒）
+IMAGE_JOB_MAX_ATTEMPTS = config('IMAGE_JOB_MAX_ATTEMPTS', default=5, cast=int)
+IMAGE_JOB_RETRY_DELAY = config('IMAGE_JOB_RETRY_DELAY', default=30, cast=int)
+IMAGE_JOB_LOCK_TIMEOUT = config('IMAGE_JOB_LOCK_TIMEOUT', default=600, cast=int)
+IMAGE_JOB_POLL_INTERVAL = config('IMAGE_JOB_POLL_INTERVAL', default=2, cast=int)
+
+# 匿名访问整页缓存时间（秒），文章、分类、标签、横幅、评论变化时由信号主动失效
+PAGE_CACHE_TIMEOUT = config('PAGE_CACHE_TIMEOUT', default=300, cast=int)
+
+# 文章热度半衰期（小时），热门列表显示的文章数；热度衰减由 decay_hot_scores 命令定时执行
+HOT_SCORE_HALF_LIFE = config('HOT_SCORE_HALF_LIFE', default=72, cast=int)
+HOT_POSTS_LIMIT = config('HOT_POSTS_LIMIT', default=20, cast=int)
+
+# 请求指标：启用后记录各视图的查询数和耗时，管理员或携带 "Authorization: Bearer <METRICS_TOKEN>" 的请求可访问 /metrics
+METRICS_ENABLED = config('METRICS_ENABLED', default=False, cast=bool)
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
+# Server-Timing 响应头：管理员，或 server_timing Cookie 与 SERVER_TIMING_TOKEN 一致的请求输出各分段耗时
+SERVER_TIMING_ENABLED = config('SERVER_TIMING_ENABLED', default=True, cast=bool)
+SERVER_TIMING_TOKEN = config('SERVER_TIMING_TOKEN', default='')
+
+# 按需性能分析：管理员访问时带 ?_profile=1 在 cProfile 下执行该请求，结果保存在 PROFILE_DIR，保留最近 PROFILE_MAX_COUNT 份
+PROFILER_ENABLED = config('PROFILER_ENABLED', default=True, cast=bool)
+PROFILE_DIR = config('PROFILE_DIR', default='') or str(BASE_DIR / 'profiles')
+PROFILE_MAX_COUNT = config('PROFILE_MAX_COUNT', default=50, cast=int)
@@ -47,6 +47,12 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     });
     
+    // 页面可能来自缓存，点赞/收藏状态和最新计数单独加载
+    const postActions = document.querySelector('.post-actions[data-user-state-url]');
+    if (postActions) {
+        loadPostUserState(postActions);
+    }
+    
     // Search form enhancement
     const searchForm = document.querySelector('.search-form');
     if (searchForm) {
@@ -62,6 +68,43 @@ document.addEventListener('DOMContentLoaded', function() {
     }
 });
 
+// Load per-user state for a (possibly cached) post page
+function loadPostUserState(container) {
+    fetch(container.dataset.userStateUrl, {credentials: 'same-origin'})
+    .then(response => response.json())
+    .then(data => {
+        if (!data.post) {
+            return;
+        }
+        const likeButton = container.querySelector('.like-btn');
+        const favoriteButton = container.querySelector('.favorite-btn');
+        if (likeButton) {
+            setActionState(likeButton, 'liked', data.post.liked, data.post.likes, '.like-text', '已点赞', '点赞', '.like-count');
+        }
+        if (favoriteButton) {
+            setActionState(favoriteButton, 'favorited', data.post.favorited, data.post.favorites, '.favorite-text', '已收藏', '收藏', '.favorite-count');
+        }
+    })
+    .catch(error => {
+        console.error('加载用户状态失败:', error);
+    });
+}
+
+// Update a like/favorite button
+function setActionState(button, activeClass, active, count, textSelector, activeText, inactiveText, countSelector) {
+    const icon = button.querySelector('i');
+    const textElement = button.querySelector(textSelector);
+    const countElement = button.querySelector(countSelector);
+    
+    button.classList.toggle(activeClass, active);
+    if (icon) {
+        icon.classList.toggle('fas', active);
+        icon.classList.toggle('far', !active);
+    }
+    if (textElement) textElement.textContent = active ? activeText : inactiveText;
+    if (countElement) countElement.textContent = count;
+}
+
 // Like post function
 function likePost(postId, button) {
     console.log('点赞操作:', postId, '用户认证状态:', isAuthenticated());